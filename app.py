@@ -5,6 +5,7 @@ import os
 from typing import Any, Dict, List, Tuple, Optional
 
 from flask import Flask, request, jsonify, send_from_directory, send_file
+from werkzeug.exceptions import BadRequest
 import logging
 import logging.handlers
 import io
@@ -17,6 +18,7 @@ from game import (
     deal_board_3x3,
     deal_board_4x4,
     legal_moves,
+    has_any_legal_move,
     apply_move,
     solve_with_cache,
     choose_ai_side_for_board,
@@ -70,7 +72,11 @@ def json_to_state(data: Dict[str, Any]) -> GameState:
     p1r, p1c = data['p1']
     p2r, p2c = data['p2']
     turn = int(data['turn'])
-    return GameState(board=board, collapsed=collapsed, p1=(int(p1r), int(p1c)), p2=(int(p2r), int(p2c)), turn=turn)
+    try:
+        return GameState(board=board, collapsed=collapsed, p1=(int(p1r), int(p1c)), p2=(int(p2r), int(p2c)), turn=turn)
+    except ValueError as e:
+        # e.g. collapsed coordinates off the board; reported to the client as a 400
+        raise BadRequest(str(e)) from e
 
 
 app = Flask(__name__, static_url_path='', static_folder='static')
@@ -91,13 +97,17 @@ def _http_resp_log(resp):
         pass
     return resp
 
+@app.errorhandler(BadRequest)
+def _bad_request(e: BadRequest) -> Any:
+    return jsonify({'ok': False, 'error': e.description}), 400
+
 # Preflight: require native C++ solver on startup (fail-fast on Render)
 try:
-    from game import _find_cpp_exe as _cpp_find
+    from game import _find_cpp_exe as _cpp_find, _load_cpp_lib as _cpp_lib
     REQUIRE_CPP = os.getenv('COLLAPSI_REQUIRE_CPP', 'true').lower() in ('1', 'true', 'yes', 'on')
     cpp_path = _cpp_find()
-    if REQUIRE_CPP and not cpp_path:
-        raise RuntimeError("C++ solver executable not found at startup. Build it and/or set COLLAPSI_CPP_EXE.")
+    if REQUIRE_CPP and not cpp_path and _cpp_lib() is None:
+        raise RuntimeError("C++ solver not found at startup. Build it and/or set COLLAPSI_CPP_EXE or COLLAPSI_CPP_LIB.")
 except Exception as _e:
     # Raising here makes misconfiguration obvious in logs and prevents silent degraded behavior
     raise
@@ -140,7 +150,7 @@ def _state_log_fields(state: GameState) -> Dict[str, Any]:
             'p1': {'r': int(state.p1[0]), 'c': int(state.p1[1])},
             'p2': {'r': int(state.p2[0]), 'c': int(state.p2[1])},
             'collapsed': [{'r': int(r), 'c': int(c)} for (r, c) in state.collapsed],
-            'collapsedCount': len(state.collapsed),
+            'collapsedCount': state.collapsed_mask.bit_count(),
             'turn': int(state.turn),
         }
     except Exception:
@@ -179,7 +189,7 @@ def _log_summary(gid: str, final_state: GameState, actual_winner: Optional[int])
         info = _GAMES.get(gid)
         if not info:
             return
-        final_grid_pretty = final_state.board.pretty(final_state.p1, final_state.p2, set(final_state.collapsed))
+        final_grid_pretty = final_state.board.pretty(final_state.p1, final_state.p2, final_state.collapsed_mask)
         record = {
             'width': info.get('width'),
             'height': info.get('height'),
@@ -431,8 +441,7 @@ def api_ai() -> Any:
     # If game concluded (opponent has no moves), log summary line and clear game session
     try:
         if game_id:
-            nxt_legal = legal_moves(next_state)
-            if not nxt_legal:
+            if not has_any_legal_move(next_state):
                 actual_winner = state.turn  # mover wins when opponent has no replies
                 _log_summary(game_id, next_state, actual_winner)
     except Exception:
@@ -28,9 +28,11 @@ inline uint64_t mix64(uint64_t value) { // SplitMix64
 
 Key64 hash_state(bb_t aMask, bb_t twoMask, bb_t threeMask, bb_t fourMask, bb_t xMask, bb_t oMask, bb_t collapsedMask, uint8_t turnValue);
 
+// Key64 values come out of hash_state(), which already ends in mix64, so the bucket
+// hash can use the key as-is instead of mixing it a second time.
 struct Key64Hasher {
   size_t operator()(const Key64& key) const noexcept {
-    return static_cast<size_t>(mix64(key));
+    return static_cast<size_t>(key);
   }
 };
 
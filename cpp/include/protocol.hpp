@@ -0,0 +1,15 @@
+#pragma once
+#include <string>
+#include "bitboard.hpp"
+#include "solver.hpp"
+
+namespace collapsi {
+
+// Parses the "--state" argument: a,2,3,4,x,o,c,turn as hex values (turn is 0/1).
+bool parse_state_arg(const std::string& arg, BitState& outState);
+
+// Formats a solve result as the single line printed by the CLI (without newline):
+// "win best_move plies <micros>us[ | move:plies:win ...]"
+std::string format_answer(const Answer& answer, long long micros, const Solver& solver);
+
+}
@@ -12,6 +12,7 @@ struct Answer { bool win; uint8_t best_move; uint16_t plies; }; // 0xFF none, pl
 
 class Solver {
 public:
+  Solver();
   Answer solve(const BitState& s);
   const std::vector<uint8_t>& last_top_moves() const { return top_moves_; }
   const std::vector<int>& last_top_move_plies() const { return top_move_plies_; }
@@ -24,6 +25,9 @@ public:
   void dump_tree_binary_to_vector(std::vector<uint8_t>& out) const;
 
 private:
+  // Initial bucket reservation for the transposition cache; a typical 4x4 solve fills tens of
+  // thousands of entries, so this avoids the early rehash cascade. clear_cache() keeps the buckets.
+  static constexpr size_t kCacheReserve = 1u << 16;
   std::unordered_map<Key64, Answer, Key64Hasher> cache_;
   std::unordered_map<Key64, std::vector<Key64>, Key64Hasher> edges_;
   Answer solve_rec(const BitState& s, int depth);
@@ -0,0 +1,75 @@
+#include <chrono>
+#include <cstring>
+#include <string>
+#include "../include/protocol.hpp"
+
+#if defined(_WIN32)
+#define COLLAPSI_API __declspec(dllexport)
+#else
+#define COLLAPSI_API __attribute__((visibility("default")))
+#endif
+
+using namespace collapsi;
+
+// In-process equivalent of `collapsi_cpp --state <arg>` for ctypes/cffi callers.
+// Writes the same single output line (NUL-terminated, no newline) into outBuf.
+// Returns the line length, -1 for a malformed state, -2 if outBuf is too small.
+extern "C" COLLAPSI_API int collapsi_solve(const char* stateArg, char* outBuf, int outLen) {
+  BitState state{};
+  if (stateArg == nullptr || !parse_state_arg(stateArg, state)) return -1;
+  Solver solver;
+  solver.set_capture_edges(false);  // plain solve: no tree dump, so subtrees may be pruned
+  auto t0 = std::chrono::high_resolution_clock::now();
+  Answer answer = solver.solve(state);
+  auto t1 = std::chrono::high_resolution_clock::now();
+  auto us = std::chrono::duration_cast<std::chrono::microseconds>(t1 - t0).count();
+  std::string line = format_answer(answer, us, solver);
+  if (outBuf == nullptr || outLen <= 0 || line.size() + 1 > static_cast<size_t>(outLen)) return -2;
+  std::memcpy(outBuf, line.c_str(), line.size() + 1);
+  return static_cast<int>(line.size());
+}
+
+// Move-generation kernel for Python callers: destinations bitmask for a 4x4 board given the
+// collapsed mask, start/opponent cell indices and step count (same DFS as the solver).
+extern "C" COLLAPSI_API unsigned int collapsi_destinations(unsigned int collapsedMask, unsigned int startIndex,
+                                                           unsigned int stepCount, unsigned int opponentIndex) {
+  BitState state{};
+  state.bbCollapsed = static_cast<bb_t>(collapsedMask);
+  return enumerate_destinations(state, static_cast<uint8_t>(startIndex & 0xF), static_cast<uint8_t>(stepCount),
+                                static_cast<uint8_t>(opponentIndex & 0xF));
+}
+
+// Shape-generic variant of collapsi_destinations for any torus up to 32 cells (e.g. the 3x3
+// variant). Same contract as the Python _destinations_mask kernel: cells reachable in exactly
+// stepCount orthogonal moves without revisiting or crossing collapsed cells, minus start/opponent.
+extern "C" COLLAPSI_API unsigned int collapsi_destinations_grid(unsigned int width, unsigned int height,
+                                                                unsigned int collapsedMask, unsigned int startIndex,
+                                                                unsigned int stepCount, unsigned int opponentIndex) {
+  const unsigned int cells = width * height;
+  if (width == 0 || height == 0 || cells > 32 || startIndex >= cells || stepCount == 0 || stepCount > 32) return 0;
+  struct Frame { uint8_t cell; uint8_t remaining; uint32_t visited; };
+  Frame stack[32 * 4];
+  int top = 0;
+  uint32_t found = 0;
+  stack[top++] = Frame{static_cast<uint8_t>(startIndex), static_cast<uint8_t>(stepCount), 1u << startIndex};
+  while (top > 0) {
+    const Frame frame = stack[--top];
+    const unsigned int r = frame.cell / width, c = frame.cell % width;
+    const unsigned int next[4] = {
+      ((r + height - 1) % height) * width + c,
+      ((r + 1) % height) * width + c,
+      r * width + (c + width - 1) % width,
+      r * width + (c + 1) % width,
+    };
+    const uint32_t avoid = collapsedMask | frame.visited;
+    for (unsigned int n : next) {
+      const uint32_t b = 1u << n;
+      if (avoid & b) continue;
+      if (frame.remaining == 1) found |= b;
+      else stack[top++] = Frame{static_cast<uint8_t>(n), static_cast<uint8_t>(frame.remaining - 1), frame.visited | b};
+    }
+  }
+  found &= ~(1u << startIndex);
+  if (opponentIndex < cells) found &= ~(1u << opponentIndex);
+  return found;
+}
@@ -4,6 +4,7 @@
 #include <string>
 #include "../include/bitboard.hpp"
 #include "../include/solver.hpp"
+#include "../include/protocol.hpp"
 
 using namespace collapsi;
 
@@ -32,41 +33,31 @@ static BitState random_deal(uint32_t randomSeed) {
   return state;
 }
 
-static bool parse_hex16(const std::string& text, uint16_t& outValue) {
-  try {
-    size_t endIndex = 0;
-    unsigned long parsedValue = std::stoul(text, &endIndex, 16);
-    if (endIndex != text.size() || parsedValue > 0xFFFFUL) return false;
-    outValue = static_cast<uint16_t>(parsedValue);
-    return true;
-  } catch(...) { return false; }
-}
-
-static bool parse_state_arg(const std::string& arg, BitState& outState) {
-  // format: a,2,3,4,x,o,c,turn (hex values, turn is 0/1)
-  std::vector<std::string> parts;
-  size_t start = 0;
-  for (size_t i = 0; i <= arg.size(); ++i) {
-    if (i == arg.size() || arg[i] == ',') {
-      parts.emplace_back(arg.substr(start, i - start));
-      start = i + 1;
-    }
+// Long-running mode: prints "ready", then answers one "--state" formatted line per input line
+// with the same output line as a one-shot run (an empty line if the state does not parse).
+static int serve() {
+  std::ios::sync_with_stdio(false);
+  std::cout << "ready" << std::endl;
+  std::string line;
+  while (std::getline(std::cin, line)) {
+    if (!line.empty() && line.back() == '\r') line.pop_back();
+    BitState state{};
+    if (!parse_state_arg(line, state)) { std::cout << std::endl; continue; }
+    Solver solver;
+    solver.set_capture_edges(false);  // plain solve: no tree dump, so subtrees may be pruned
+    auto t0 = std::chrono::high_resolution_clock::now();
+    Answer answer = solver.solve(state);
+    auto t1 = std::chrono::high_resolution_clock::now();
+    auto ms = std::chrono::duration_cast<std::chrono::microseconds>(t1 - t0).count();
+    std::cout << format_answer(answer, ms, solver) << std::endl;
   }
-  if (parts.size() != 8) return false;
-  uint16_t aMask, twoMask, threeMask, fourMask, xMask, oMask, collapsedMask; uint16_t turnValue;
-  if (!parse_hex16(parts[0], aMask)) return false;
-  if (!parse_hex16(parts[1], twoMask)) return false;
-  if (!parse_hex16(parts[2], threeMask)) return false;
-  if (!parse_hex16(parts[3], fourMask)) return false;
-  if (!parse_hex16(parts[4], xMask)) return false;
-  if (!parse_hex16(parts[5], oMask)) return false;
-  if (!parse_hex16(parts[6], collapsedMask)) return false;
-  if (!parse_hex16(parts[7], turnValue)) return false;
-  outState.bbA = aMask; outState.bb2 = twoMask; outState.bb3 = threeMask; outState.bb4 = fourMask; outState.bbX = xMask; outState.bbO = oMask; outState.bbCollapsed = collapsedMask; outState.turn = static_cast<uint8_t>(turnValue & 1);
-  return true;
+  return 0;
 }
 
 int main(int argc, char** argv) {
+  if (argc >= 2 && std::string(argv[1]) == "--server") {
+    return serve();
+  }
   uint32_t seed = static_cast<uint32_t>(std::random_device{}());
   BitState state{};
   if (argc >= 3 && std::string(argv[1]) == "--seed") {
@@ -81,22 +72,12 @@ int main(int argc, char** argv) {
     state = random_deal(seed);
   }
   Solver solver;
+  solver.set_capture_edges(false);  // plain solve: no tree dump, so subtrees may be pruned
   auto t0 = std::chrono::high_resolution_clock::now();
   Answer answer = solver.solve(state);
   auto t1 = std::chrono::high_resolution_clock::now();
   auto ms = std::chrono::duration_cast<std::chrono::microseconds>(t1 - t0).count();
-  // Output: win best_move plies timeus | then list of top-move plies for legal moves
-  std::cout << (answer.win ? 1 : 0) << " " << int(answer.best_move) << " " << int(answer.plies) << " " << ms << "us";
-  const auto& topMoves = solver.last_top_moves();
-  const auto& topPlies = solver.last_top_move_plies();
-  const auto& topWins = solver.last_top_move_wins();
-  if (!topMoves.empty() && topMoves.size() == topPlies.size() && topWins.size() == topMoves.size()) {
-    std::cout << " |";
-    for (size_t i = 0; i < topMoves.size(); ++i) {
-      std::cout << " " << int(topMoves[i]) << ":" << topPlies[i] << ":" << int(topWins[i]);
-    }
-  }
-  std::cout << std::endl;
+  std::cout << format_answer(answer, ms, solver) << std::endl;
   return 0;
 }
 
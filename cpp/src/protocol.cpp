@@ -0,0 +1,57 @@
+#include "../include/protocol.hpp"
+#include <sstream>
+#include <vector>
+
+namespace collapsi {
+
+static bool parse_hex16(const std::string& text, uint16_t& outValue) {
+  try {
+    size_t endIndex = 0;
+    unsigned long parsedValue = std::stoul(text, &endIndex, 16);
+    if (endIndex != text.size() || parsedValue > 0xFFFFUL) return false;
+    outValue = static_cast<uint16_t>(parsedValue);
+    return true;
+  } catch(...) { return false; }
+}
+
+bool parse_state_arg(const std::string& arg, BitState& outState) {
+  // format: a,2,3,4,x,o,c,turn (hex values, turn is 0/1)
+  std::vector<std::string> parts;
+  size_t start = 0;
+  for (size_t i = 0; i <= arg.size(); ++i) {
+    if (i == arg.size() || arg[i] == ',') {
+      parts.emplace_back(arg.substr(start, i - start));
+      start = i + 1;
+    }
+  }
+  if (parts.size() != 8) return false;
+  uint16_t aMask, twoMask, threeMask, fourMask, xMask, oMask, collapsedMask; uint16_t turnValue;
+  if (!parse_hex16(parts[0], aMask)) return false;
+  if (!parse_hex16(parts[1], twoMask)) return false;
+  if (!parse_hex16(parts[2], threeMask)) return false;
+  if (!parse_hex16(parts[3], fourMask)) return false;
+  if (!parse_hex16(parts[4], xMask)) return false;
+  if (!parse_hex16(parts[5], oMask)) return false;
+  if (!parse_hex16(parts[6], collapsedMask)) return false;
+  if (!parse_hex16(parts[7], turnValue)) return false;
+  outState.bbA = aMask; outState.bb2 = twoMask; outState.bb3 = threeMask; outState.bb4 = fourMask; outState.bbX = xMask; outState.bbO = oMask; outState.bbCollapsed = collapsedMask; outState.turn = static_cast<uint8_t>(turnValue & 1);
+  return true;
+}
+
+std::string format_answer(const Answer& answer, long long micros, const Solver& solver) {
+  // Output: win best_move plies timeus | then list of top-move plies for legal moves
+  std::ostringstream out;
+  out << (answer.win ? 1 : 0) << " " << int(answer.best_move) << " " << int(answer.plies) << " " << micros << "us";
+  const auto& topMoves = solver.last_top_moves();
+  const auto& topPlies = solver.last_top_move_plies();
+  const auto& topWins = solver.last_top_move_wins();
+  if (!topMoves.empty() && topMoves.size() == topPlies.size() && topWins.size() == topMoves.size()) {
+    out << " |";
+    for (size_t i = 0; i < topMoves.size(); ++i) {
+      out << " " << int(topMoves[i]) << ":" << topPlies[i] << ":" << int(topWins[i]);
+    }
+  }
+  return out.str();
+}
+
+}
@@ -12,6 +12,36 @@ static uint8_t piece_idx(bb_t bitboard) {
   return 0;
 }
 
+namespace {
+
+struct Item { uint8_t move; int orderKey; };  // orderKey: opponent reply count, or -1 for exactly one
+
+// Heuristic: order by opponent replies ascending, with exactly-1 first. Folded into a single
+// sort key (1 -> -1, otherwise the count) so one stable sort does it without a special pass.
+std::vector<Item> order_moves(const BitState& state, uint8_t currentPlayerIndex, bb_t destinationsMask) {
+  std::vector<Item> orderedMoves;
+  orderedMoves.reserve(static_cast<size_t>(std::popcount(destinationsMask)));
+  for (uint8_t destinationIndex = 0; destinationIndex < BOARD_N; ++destinationIndex) if (destinationsMask & bit(destinationIndex)) {
+    BitState nextState = apply_move(state, currentPlayerIndex, destinationIndex);
+    const uint8_t nextCurrentPlayerIndex = (nextState.turn == 0) ? piece_idx(nextState.bbX) : piece_idx(nextState.bbO);
+    const uint8_t nextOpponentIndex = (nextState.turn == 0) ? piece_idx(nextState.bbO) : piece_idx(nextState.bbX);
+    const uint8_t nextStepCount = steps_from(nextState, nextCurrentPlayerIndex);
+    bb_t opponentDestinationsMask = enumerate_destinations(nextState, nextCurrentPlayerIndex, nextStepCount, nextOpponentIndex);
+    int replyCount = std::popcount(opponentDestinationsMask);
+    orderedMoves.push_back({encode_move(currentPlayerIndex, destinationIndex), replyCount == 1 ? -1 : replyCount});
+  }
+  std::stable_sort(orderedMoves.begin(), orderedMoves.end(), [](const Item& a, const Item& b){
+    return a.orderKey < b.orderKey;
+  });
+  return orderedMoves;
+}
+
+}  // namespace
+
+Solver::Solver() {
+  cache_.reserve(kCacheReserve);
+}
+
 Answer Solver::solve(const BitState& state) {
   top_moves_.clear();
   top_move_plies_.clear();
@@ -38,24 +68,7 @@ Answer Solver::solve_rec(const BitState& state, int depth) {
     return answer;
   }
 
-  // Heuristic: order by opponent replies ascending, with 1 first
-  struct Item { uint8_t move; int opponentRepliesCount; };
-  std::vector<Item> orderedMoves;
-  for (uint8_t destinationIndex = 0; destinationIndex < BOARD_N; ++destinationIndex) if (destinationsMask & bit(destinationIndex)) {
-    BitState nextState = apply_move(state, currentPlayerIndex, destinationIndex);
-    const uint8_t nextCurrentPlayerIndex = (nextState.turn == 0) ? piece_idx(nextState.bbX) : piece_idx(nextState.bbO);
-    const uint8_t nextOpponentIndex = (nextState.turn == 0) ? piece_idx(nextState.bbO) : piece_idx(nextState.bbX);
-    const uint8_t nextStepCount = steps_from(nextState, nextCurrentPlayerIndex);
-    bb_t opponentDestinationsMask = enumerate_destinations(nextState, nextCurrentPlayerIndex, nextStepCount, nextOpponentIndex);
-    int replyCount = std::popcount(opponentDestinationsMask);
-    orderedMoves.push_back({encode_move(currentPlayerIndex, destinationIndex), replyCount});
-  }
-  // Move with exactly 1 opp reply goes to front
-  std::stable_sort(orderedMoves.begin(), orderedMoves.end(), [](const Item& a, const Item& b){
-    if (a.opponentRepliesCount == 1 && b.opponentRepliesCount != 1) return true;
-    if (a.opponentRepliesCount != 1 && b.opponentRepliesCount == 1) return false;
-    return a.opponentRepliesCount < b.opponentRepliesCount;
-  });
+  std::vector<Item> orderedMoves = order_moves(state, currentPlayerIndex, destinationsMask);
 
   int bestLossPlies = -1; // maximize delay if losing
   uint8_t bestLossMove = 0xFF;
@@ -64,7 +77,14 @@ Answer Solver::solve_rec(const BitState& state, int depth) {
   std::vector<uint8_t> ui_moves;
   std::vector<int> ui_plies;
   std::vector<uint8_t> ui_wins;
+  // Below the root only the answer matters (no per-move UI metrics), so once a winning
+  // move is known we can stop on anything that cannot beat it. The cached answer stays exact:
+  // a 1-ply win is unbeatable, and a candidate is dropped as soon as it is refuted or its
+  // worst-case win is no faster than the current best. Tree dumps (capture_edges_) need
+  // every child expanded, so they never prune.
+  const bool prune = depth > 0 && !capture_edges_;
   for (const Item& moveEntry : orderedMoves) {
+    if (prune && bestWinPlies == 1) break;
     uint8_t toIndex = move_to(moveEntry.move);
     BitState nextState = apply_move(state, currentPlayerIndex, toIndex);
     // AND over opponent replies: if any reply leads to our loss, this move fails
@@ -89,6 +109,7 @@ Answer Solver::solve_rec(const BitState& state, int depth) {
           // slowest win path (opponent delays)
           if (replyAnswer.plies + 2 > worstWinPlies) worstWinPlies = replyAnswer.plies + 2;
         }
+        if (prune && bestWinMove != 0xFF && (!allOpponentRepliesLeadToOurWin || worstWinPlies >= bestWinPlies)) break;
       }
     }
     // Record edge for optional tree dump
@@ -137,22 +158,7 @@ void Solver::compute_root_move_metrics(const BitState& state) {
   const uint8_t stepCount = steps_from(state, currentPlayerIndex);
   bb_t destinationsMask = enumerate_destinations(state, currentPlayerIndex, stepCount, opponentIndex);
   if (destinationsMask == 0) return;
-  struct Item { uint8_t move; int opponentRepliesCount; };
-  std::vector<Item> orderedMoves;
-  for (uint8_t destinationIndex = 0; destinationIndex < BOARD_N; ++destinationIndex) if (destinationsMask & bit(destinationIndex)) {
-    BitState nextState = apply_move(state, currentPlayerIndex, destinationIndex);
-    const uint8_t nextCurrentPlayerIndex = (nextState.turn == 0) ? piece_idx(nextState.bbX) : piece_idx(nextState.bbO);
-    const uint8_t nextOpponentIndex = (nextState.turn == 0) ? piece_idx(nextState.bbO) : piece_idx(nextState.bbX);
-    const uint8_t nextStepCount = steps_from(nextState, nextCurrentPlayerIndex);
-    bb_t opponentDestinationsMask = enumerate_destinations(nextState, nextCurrentPlayerIndex, nextStepCount, nextOpponentIndex);
-    int replyCount = std::popcount(opponentDestinationsMask);
-    orderedMoves.push_back({encode_move(currentPlayerIndex, destinationIndex), replyCount});
-  }
-  std::stable_sort(orderedMoves.begin(), orderedMoves.end(), [](const Item& a, const Item& b){
-    if (a.opponentRepliesCount == 1 && b.opponentRepliesCount != 1) return true;
-    if (a.opponentRepliesCount != 1 && b.opponentRepliesCount == 1) return false;
-    return a.opponentRepliesCount < b.opponentRepliesCount;
-  });
+  std::vector<Item> orderedMoves = order_moves(state, currentPlayerIndex, destinationsMask);
   for (const Item& moveEntry : orderedMoves) {
     uint8_t toIndex = move_to(moveEntry.move);
     BitState nextState = apply_move(state, currentPlayerIndex, toIndex);
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import atexit
+import bisect
+import concurrent.futures
+import ctypes
+import functools
 import random
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import subprocess
 import os
 import shutil
 import sqlite3
+import struct
+import threading
 from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Set, Iterable, Any
+from typing import List, Tuple, Optional, Dict, Set, Iterable, Iterator, Any, Union
 
 
 # -------- Collapsi core model --------
@@ -17,12 +25,40 @@ Card = str  # 'J', 'A', '2', '3', '4'
 Coord = Tuple[int, int]
 
 
-@dataclass(frozen=True)
+# Board.pretty glyph per (collapsed, is_p1, is_p2) bit triple; '' means "show the card".
+_PRETTY_GLYPHS: Tuple[str, ...] = ('', 'O', 'X', '*', '·', '·', '·', '·')
+
+
+@dataclass(frozen=True, slots=True)
 class Board:
     """Represents the static game board, including its dimensions and the grid of cards."""
     width: int
     height: int
     grid: Tuple[Card, ...]  # row-major, length == width * height
+    steps: Tuple[int, ...] = field(init=False, repr=False, compare=False)  # card_steps per cell, same order as grid
+    # Per-cell (up, down, left, right) neighbor indices with wrap-around; shared by boards of the same size.
+    neighbor_idx: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False, compare=False)
+    # (a, b2, b3, b4) card bitboards, bit index r * width + c; Jacks share the A mask (both step 1).
+    card_masks: Tuple[int, int, int, int] = field(init=False, repr=False, compare=False)
+    # Hash of (width, height, grid), computed once; boards are immutable and shared by all states of a game.
+    board_hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, 'steps', _grid_steps(self.grid))
+        object.__setattr__(self, 'neighbor_idx', _neighbor_table(self.width, self.height))
+        object.__setattr__(self, 'card_masks', _card_masks(self.grid))
+        object.__setattr__(self, 'board_hash', hash((self.width, self.height, self.grid)))
+
+    def __hash__(self) -> int:
+        return self.board_hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is not Board:
+            return NotImplemented
+        return (self.board_hash == other.board_hash and self.width == other.width
+                and self.height == other.height and self.grid == other.grid)
 
     def index(self, r: int, c: int) -> int:
         """Calculates the 1D index for a given row and column."""
@@ -30,7 +66,9 @@ class Board:
 
     def at(self, r: int, c: int) -> Card:
         """Gets the card at a given row and column with wrap-around logic."""
-        return self.grid[self.index(r % self.height, c % self.width)]
+        # Inlined index() to skip the extra method call on this per-cell accessor.
+        w = self.width
+        return self.grid[(r % self.height) * w + c % w]
 
     def coords(self) -> Iterable[Coord]:
         """Iterates over all coordinates on the board."""
@@ -38,78 +76,135 @@ class Board:
             for c in range(self.width):
                 yield (r, c)
 
-    def pretty(self, p1: Optional[Coord] = None, p2: Optional[Coord] = None, collapsed: Optional[Set[Coord]] = None) -> str:
-        """Generates a human-readable string representation of the board state."""
+    def pretty(self, p1: Optional[Coord] = None, p2: Optional[Coord] = None,
+               collapsed: Optional[Union[Set[Coord], int]] = None) -> str:
+        """Generates a human-readable string representation of the board state.
+        `collapsed` may be a set of coordinates or a collapsed bitmask (GameState.collapsed_mask)."""
         lines: List[str] = []
-        collapsed = collapsed or set()
+        if collapsed is None:
+            collapsed = 0
+        if not isinstance(collapsed, int):
+            collapsed_set = collapsed
+            collapsed = 0
+            for (r, c) in collapsed_set:
+                collapsed |= 1 << (r * self.width + c)
         for r in range(self.height):
             row: List[str] = []
             for c in range(self.width):
-                cell = self.at(r, c)
-                if (r, c) in collapsed:
-                    row.append('·')
-                elif p1 == (r, c) and p2 == (r, c):
-                    row.append('*')
-                elif p1 == (r, c):
-                    row.append('X')
-                elif p2 == (r, c):
-                    row.append('O')
-                else:
-                    row.append(cell)
+                coord = (r, c)
+                idx = r * self.width + c
+                glyph = _PRETTY_GLYPHS[(((collapsed >> idx) & 1) << 2) | ((p1 == coord) << 1) | (p2 == coord)]
+                row.append(glyph or self.grid[idx])
             lines.append(' '.join(row))
         return '\n'.join(lines)
 
 
+# Deck compositions, shuffled per deal. The first two Jacks revealed are the starting positions.
+_DECK_4X4: Tuple[Card, ...] = ('J', 'J') + ('A',) * 4 + ('2',) * 4 + ('3',) * 4 + ('4',) * 2
+_DECK_3X3: Tuple[Card, ...] = ('J', 'J') + ('A',) * 4 + ('2',) * 3
+
+
+def _deal_board(deck_template: Tuple[Card, ...], size: int, seed: Optional[int]) -> Tuple[Board, Coord, Coord]:
+    deck = list(deck_template)
+    random.Random(seed).shuffle(deck)
+    board = Board(width=size, height=size, grid=tuple(deck))
+    # Locate the first two Jacks directly in the row-major deck rather than scanning every coord.
+    try:
+        first = deck.index('J')
+        second = deck.index('J', first + 1)
+    except ValueError:
+        raise ValueError('Invalid deck: expected two Jacks') from None
+    return board, divmod(first, size), divmod(second, size)
+
+
 def deal_board_4x4(seed: Optional[int] = None) -> Tuple[Board, Coord, Coord]:
     """Creates and deals a 4x4 board with a standard deck of 16 cards."""
-    rng = random.Random(seed)
-    # Deck composition for a 4x4 board.
-    deck: List[Card] = ['J', 'J'] + ['A'] * 4 + ['2'] * 4 + ['3'] * 4 + ['4'] * 2
-    rng.shuffle(deck)
-    width = height = 4
-    board = Board(width=width, height=height, grid=tuple(deck))
-    # The first two Jacks revealed are the starting positions for Player 1 and Player 2.
-    jack_positions = [coord for coord in board.coords() if board.at(*coord) == 'J']
-    if len(jack_positions) < 2:
-        raise ValueError('Invalid deck: expected two Jacks')
-    p1_start, p2_start = jack_positions[0], jack_positions[1]
-    return board, p1_start, p2_start
+    return _deal_board(_DECK_4X4, 4, seed)
 
 
 def deal_board_3x3(seed: Optional[int] = None) -> Tuple[Board, Coord, Coord]:
     """Creates and deals a 3x3 board with a modified 9-card deck."""
-    rng = random.Random(seed)
-    # Deck composition for a 3x3 board.
-    deck: List[Card] = ['J', 'J'] + ['A'] * 4 + ['2'] * 3
-    rng.shuffle(deck)
-    width = height = 3
-    board = Board(width=width, height=height, grid=tuple(deck))
-    jack_positions = [coord for coord in board.coords() if board.at(*coord) == 'J']
-    if len(jack_positions) < 2:
-        raise ValueError('Invalid deck: expected two Jacks')
-    p1_start, p2_start = jack_positions[0], jack_positions[1]
-    return board, p1_start, p2_start
+    return _deal_board(_DECK_3X3, 3, seed)
+
+
+_CARD_STEPS: Dict[Card, int] = {'J': 1, 'A': 1, '2': 2, '3': 3, '4': 4}
 
 
 def card_steps(card: Card) -> int:
     """Determines the number of steps a player can move based on the card value."""
-    if card == 'J' or card == 'A':
-        return 1
-    return int(card)
+    steps = _CARD_STEPS.get(card)
+    return steps if steps is not None else int(card)
+
+
+@functools.lru_cache(maxsize=4096)
+def _grid_steps(grid: Tuple[Card, ...]) -> Tuple[int, ...]:
+    """Per-cell step counts for a grid; shared by Boards built from the same grid (e.g. torus views)."""
+    steps = _CARD_STEPS
+    return tuple(steps[card] if card in steps else card_steps(card) for card in grid)
 
 
-@dataclass(frozen=True)
+# Zobrist keys per cell index (cells beyond 64 fold onto these) and for side to move.
+_ZOB_RNG = random.Random(0)
+_ZOB_COLLAPSE: Tuple[int, ...] = tuple(_ZOB_RNG.getrandbits(64) for _ in range(64))
+_ZOB_P1: Tuple[int, ...] = tuple(_ZOB_RNG.getrandbits(64) for _ in range(64))
+_ZOB_P2: Tuple[int, ...] = tuple(_ZOB_RNG.getrandbits(64) for _ in range(64))
+_ZOB_TURN: int = _ZOB_RNG.getrandbits(64)
+del _ZOB_RNG
+
+
+@dataclass(frozen=True, slots=True)
 class GameState:
     """Represents the dynamic state of the game, including player positions and collapsed cards."""
     board: Board
-    collapsed: Tuple[Coord, ...]  # An immutable set of collapsed coordinates, sorted for consistent hashing.
+    # Collapsed coordinates in row-major order; derived from collapsed_mask, which is what
+    # equality, hashing and move generation use.
+    collapsed: Tuple[Coord, ...] = field(compare=False)
     p1: Coord
     p2: Coord
     turn: int  # 1 or 2
+    collapsed_mask: int = field(init=False, repr=False)  # bit (r * width + c) set per collapsed cell
+    # Zobrist hash of (collapsed, p1, p2, turn); the board is left out since memo tables share one board.
+    hash_key: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        w = self.board.width
+        height = self.board.height
+        mask = 0
+        for name, (r, c) in (('p1', self.p1), ('p2', self.p2)):
+            if not (0 <= r < height and 0 <= c < w):
+                raise ValueError(f"{name} coordinate {(r, c)} is outside the {w}x{height} board")
+        for (r, c) in self.collapsed:
+            if not (0 <= r < height and 0 <= c < w):
+                raise ValueError(f"collapsed coordinate {(r, c)} is outside the {w}x{height} board")
+            mask |= 1 << (r * w + c)
+        object.__setattr__(self, 'collapsed_mask', mask)
+        object.__setattr__(self, 'collapsed', tuple(_mask_to_coords(mask, w)))
+        h = _ZOB_P1[(self.p1[0] * w + self.p1[1]) & 63] ^ _ZOB_P2[(self.p2[0] * w + self.p2[1]) & 63]
+        while mask:
+            low = mask & -mask
+            h ^= _ZOB_COLLAPSE[(low.bit_length() - 1) & 63]
+            mask ^= low
+        if self.turn != 1:
+            h ^= _ZOB_TURN
+        object.__setattr__(self, 'hash_key', h)
+
+    def __hash__(self) -> int:
+        return self.hash_key
+
+    def __eq__(self, other: object) -> bool:
+        # Memo-table probes compare states that usually share one Board, so check the cheap ints
+        # (Zobrist key first) and board identity before falling back to a full board comparison.
+        if self is other:
+            return True
+        if other.__class__ is not GameState:
+            return NotImplemented
+        return (self.hash_key == other.hash_key and self.collapsed_mask == other.collapsed_mask
+                and self.turn == other.turn and self.p1 == other.p1 and self.p2 == other.p2
+                and (self.board is other.board or self.board == other.board))
 
     def is_collapsed(self, coord: Coord) -> bool:
         """Checks if a coordinate is collapsed."""
-        return coord in set(self.collapsed)
+        return bool((self.collapsed_mask >> (coord[0] * self.board.width + coord[1])) & 1)
 
     def other_player(self) -> int:
         """Returns the opponent of the current player."""
@@ -121,7 +216,25 @@ class GameState:
 
     def with_turn(self, next_turn: int) -> 'GameState':
         """Creates a new GameState with the turn updated."""
-        return GameState(self.board, self.collapsed, self.p1, self.p2, next_turn)
+        # Reuses the collapsed tuple/mask; only the side-to-move bit of the Zobrist key can change.
+        flip = (next_turn != 1) != (self.turn != 1)
+        return _make_state(self.board, self.collapsed, self.collapsed_mask, self.p1, self.p2, next_turn,
+                           self.hash_key ^ _ZOB_TURN if flip else self.hash_key)
+
+
+# Card -> bitboard slot (a, b2, b3, b4); Jacks share the A bitboard (both step 1).
+_CARD_SLOT: Dict[Card, int] = {'J': 0, 'A': 0, '2': 1, '3': 2, '4': 3}
+
+
+@functools.lru_cache(maxsize=4096)
+def _card_masks(grid: Tuple[Card, ...]) -> Tuple[int, int, int, int]:
+    """Return the (a, b2, b3, b4) card bitboards of a grid, computed in one pass."""
+    masks = [0, 0, 0, 0]
+    for idx, card in enumerate(grid):
+        slot = _CARD_SLOT.get(card)
+        if slot is not None:
+            masks[slot] |= (1 << idx)
+    return masks[0], masks[1], masks[2], masks[3]
 
 
 def wrap_step(board: Board, r: int, c: int) -> Coord:
@@ -132,99 +245,382 @@ def wrap_step(board: Board, r: int, c: int) -> Coord:
 def neighbors(board: Board, coord: Coord) -> List[Coord]:
     """Gets the orthogonal neighbors of a coordinate."""
     r, c = coord
-    return [
-        wrap_step(board, r - 1, c),
-        wrap_step(board, r + 1, c),
-        wrap_step(board, r, c - 1),
-        wrap_step(board, r, c + 1),
-    ]
-
-
-def enumerate_destinations(state: GameState, start: Coord, steps: int, opponent: Coord) -> Set[Coord]:
+    return list(_neighbor_coord_table(board.width, board.height)[(r % board.height) * board.width + c % board.width])
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbor_coord_table(width: int, height: int) -> Tuple[Tuple[Coord, ...], ...]:
+    """_neighbor_table with each index already converted to an (r, c) coordinate."""
+    return tuple(tuple(divmod(idx, width) for idx in row) for row in _neighbor_table(width, height))
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbor_table(width: int, height: int) -> Tuple[Tuple[int, ...], ...]:
+    """Per-cell orthogonal neighbor indices (up, down, left, right) with wrap-around."""
+    table: List[Tuple[int, ...]] = []
+    for r in range(height):
+        for c in range(width):
+            table.append(tuple(rr * width + cc for rr, cc in (
+                ((r - 1) % height, c),
+                ((r + 1) % height, c),
+                (r, (c - 1) % width),
+                (r, (c + 1) % width),
+            )))
+    return tuple(table)
+
+
+def _mask_to_coords(mask: int, width: int) -> List[Coord]:
+    """Converts a cell bitmask into coordinates, in ascending index (row-major) order."""
+    out: List[Coord] = []
+    while mask:
+        low = mask & -mask
+        out.append(divmod(low.bit_length() - 1, width))
+        mask ^= low
+    return out
+
+
+def enumerate_destinations(state: GameState, start: Coord, steps: int, opponent: Coord,
+                           paths: Optional[Dict[Coord, List[Coord]]] = None) -> Set[Coord]:
     """
     Finds all possible destination coordinates for a player's move.
     This is done using a Depth First Search (DFS) to find all paths of a specific length.
+    Cells are tracked as bit indices, so blocked/visited checks are single mask tests.
+    If `paths` is given, it is filled with the first path (start..dest) found for each destination
+    in the same DFS; otherwise no paths are built.
     """
-    results: Set[Coord] = set()
-    visited_path: Set[Coord] = set([start])
-    blocked: Set[Coord] = set(state.collapsed)
+    w = state.board.width
+    blocked = state.collapsed_mask
+    start_idx = start[0] * w + start[1]
+    opp_idx = opponent[0] * w + opponent[1]
+    if paths is not None:
+        for dest_idx, path in _destination_paths(state.board.neighbor_idx, blocked, start_idx, steps, opp_idx).items():
+            paths[divmod(dest_idx, w)] = [divmod(idx, w) for idx in path]
+        return set(paths)
+    found = _destinations_cached(w, state.board.height, blocked, start_idx, steps, opp_idx)
+    return set(_mask_to_coords(found, w))
+
+
+def enumerate_destinations_mask(state: GameState, start: Coord, steps: int, opponent: Coord) -> int:
+    """Like enumerate_destinations, but returns the destinations as a cell bitmask (bit r * width + c)."""
+    w = state.board.width
+    return _destinations_cached(w, state.board.height, state.collapsed_mask, start[0] * w + start[1], steps,
+                                opponent[0] * w + opponent[1])
+
+
+def _legal_move_mask(state: GameState) -> int:
+    """Bitmask of the current player's legal destinations."""
+    board = state.board
+    me = state.p1 if state.turn == 1 else state.p2
+    opp = state.p2 if state.turn == 1 else state.p1
+    w = board.width
+    start_idx = me[0] * w + me[1]
+    return _destinations_cached(w, board.height, state.collapsed_mask, start_idx, board.steps[start_idx],
+                                opp[0] * w + opp[1])
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _destinations_cached(width: int, height: int, blocked: int, start_idx: int, steps: int, opp_idx: int) -> int:
+    # Destinations depend only on the board shape, the blocked mask, the two positions and the
+    # step count (not on the other cards), so transpositions and repeated probes hit this cache.
+    native = _native_destinations() if (width == 4 and height == 4) else None
+    if native is not None:
+        return native(blocked, start_idx, steps, opp_idx)
+    native_grid = _native_destinations_grid() if width * height <= 32 else None
+    if native_grid is not None:
+        return native_grid(width, height, blocked, start_idx, steps, opp_idx)
+    return _destinations_mask(_neighbor_table(width, height), blocked, start_idx, steps, opp_idx)
+
+
+def _dests_1(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start: int) -> int:
+    avoid = blocked | (1 << start)
+    found = 0
+    for a in neigh[start]:
+        found |= (1 << a) & ~avoid
+    return found
+
+
+def _dests_2(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start: int) -> int:
+    avoid0 = blocked | (1 << start)
+    found = 0
+    for a in neigh[start]:
+        bit_a = 1 << a
+        if avoid0 & bit_a:
+            continue
+        avoid1 = avoid0 | bit_a
+        for b in neigh[a]:
+            found |= (1 << b) & ~avoid1
+    return found
+
 
-    def dfs(current: Coord, remaining: int) -> None:
+def _dests_3(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start: int) -> int:
+    avoid0 = blocked | (1 << start)
+    found = 0
+    for a in neigh[start]:
+        bit_a = 1 << a
+        if avoid0 & bit_a:
+            continue
+        avoid1 = avoid0 | bit_a
+        for b in neigh[a]:
+            bit_b = 1 << b
+            if avoid1 & bit_b:
+                continue
+            avoid2 = avoid1 | bit_b
+            for c in neigh[b]:
+                found |= (1 << c) & ~avoid2
+    return found
+
+
+def _dests_4(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start: int) -> int:
+    avoid0 = blocked | (1 << start)
+    found = 0
+    for a in neigh[start]:
+        bit_a = 1 << a
+        if avoid0 & bit_a:
+            continue
+        avoid1 = avoid0 | bit_a
+        for b in neigh[a]:
+            bit_b = 1 << b
+            if avoid1 & bit_b:
+                continue
+            avoid2 = avoid1 | bit_b
+            for c in neigh[b]:
+                bit_c = 1 << c
+                if avoid2 & bit_c:
+                    continue
+                avoid3 = avoid2 | bit_c
+                for d in neigh[c]:
+                    found |= (1 << d) & ~avoid3
+    return found
+
+
+# Unrolled kernels for the step counts the decks use (J/A=1 .. 4), indexed by steps.
+_DESTS_BY_STEPS = (None, _dests_1, _dests_2, _dests_3, _dests_4)
+
+
+def _destinations_mask(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start_idx: int, steps: int, opp_idx: int) -> int:
+    """Pure-Python DFS kernel: bitmask of cells reachable in exactly `steps` orthogonal moves."""
+    if steps <= 0:
+        return 0
+    if steps < len(_DESTS_BY_STEPS):
+        # A move must not land on the start or opponent's position.
+        return _DESTS_BY_STEPS[steps](neigh, blocked, start_idx) & ~((1 << start_idx) | (1 << opp_idx))
+    found = 0
+    # Explicit DFS stack of (cell, remaining steps, visited-path mask). The last step is
+    # resolved in place (OR the free neighbors into `found`) instead of pushing leaf frames.
+    stack = [(start_idx, steps, 1 << start_idx)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        current, remaining, visited = pop()
+        avoid = blocked | visited
+        if remaining == 1:
+            for nxt in neigh[current]:
+                found |= (1 << nxt) & ~avoid
+            continue
+        for nxt in neigh[current]:
+            bit = 1 << nxt
+            if not avoid & bit:
+                push((nxt, remaining - 1, visited | bit))
+    # A move must not land on the start or opponent's position.
+    return found & ~((1 << start_idx) | (1 << opp_idx))
+
+
+def _destination_paths(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start_idx: int, steps: int,
+                       opp_idx: int) -> Dict[int, Tuple[int, ...]]:
+    """Like _destinations_mask, but maps each destination index to the first index path reaching it.
+    Neighbors are pushed in reverse so they pop in the same order as a recursive DFS."""
+    first: Dict[int, Tuple[int, ...]] = {}
+    stack = [(start_idx, steps, 1 << start_idx, (start_idx,))]
+    while stack:
+        current, remaining, visited, path = stack.pop()
         if remaining == 0:
             # A move must not land on the start or opponent's position.
-            if current != start and current != opponent:
-                results.add(current)
-            return
-        for nxt in neighbors(state.board, current):
-            if nxt in blocked or nxt in visited_path:
-                continue
-            visited_path.add(nxt)
-            dfs(nxt, remaining - 1)
-            visited_path.remove(nxt)
+            if current != start_idx and current != opp_idx and current not in first:
+                first[current] = path
+            continue
+        avoid = blocked | visited
+        for nxt in reversed(neigh[current]):
+            bit = 1 << nxt
+            if not avoid & bit:
+                stack.append((nxt, remaining - 1, visited | bit, path + (nxt,)))
+    return first
+
+
+@functools.lru_cache(maxsize=1)
+def _native_destinations() -> Optional[Any]:
+    """The C++ move-generation kernel (collapsi_destinations) for 4x4 boards; None if the
+    shared library is not built or predates it. Set COLLAPSI_PY_MOVEGEN=1 to force Python."""
+    if os.getenv('COLLAPSI_PY_MOVEGEN', '').lower() in ('1', 'true', 'yes', 'on'):
+        return None
+    lib = _load_cpp_lib()
+    fn = getattr(lib, 'collapsi_destinations', None) if lib is not None else None
+    if fn is None:
+        return None
+    fn.argtypes = (ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint)
+    fn.restype = ctypes.c_uint
+    return fn
+
+
+@functools.lru_cache(maxsize=1)
+def _native_destinations_grid() -> Optional[Any]:
+    """Shape-generic C++ kernel (collapsi_destinations_grid) for boards up to 32 cells, e.g. 3x3;
+    None if unavailable. Honors COLLAPSI_PY_MOVEGEN like _native_destinations."""
+    if os.getenv('COLLAPSI_PY_MOVEGEN', '').lower() in ('1', 'true', 'yes', 'on'):
+        return None
+    lib = _load_cpp_lib()
+    fn = getattr(lib, 'collapsi_destinations_grid', None) if lib is not None else None
+    if fn is None:
+        return None
+    fn.argtypes = (ctypes.c_uint,) * 6
+    fn.restype = ctypes.c_uint
+    return fn
 
-    dfs(start, steps)
-    return results
 
 
+# Memoized legal move lists per state; cleared wholesale when it grows past the cap.
+_LEGAL_CACHE: Dict[GameState, Tuple[Coord, ...]] = {}
+_LEGAL_CACHE_MAX = 1 << 16
+
 
 def legal_moves(state: GameState) -> List[Coord]:
     """Calculates all legal moves for the current player."""
-    player = state.turn
-    me = state.player_pos(player)
+    cached = _LEGAL_CACHE.get(state)
+    if cached is None:
+        # Mask bits are walked in ascending index order, so the moves come out row-major sorted.
+        cached = tuple(_mask_to_coords(_legal_move_mask(state), state.board.width))
+        if len(_LEGAL_CACHE) >= _LEGAL_CACHE_MAX:
+            _LEGAL_CACHE.clear()
+        _LEGAL_CACHE[state] = cached
+    return list(cached)
+
+
+def has_any_legal_move(state: GameState) -> bool:
+    """Whether the current player has at least one legal move. Cheaper than legal_moves() when
+    only emptiness matters: the DFS stops at the first valid destination."""
+    cached = _LEGAL_CACHE.get(state)
+    if cached is not None:
+        return bool(cached)
+    board = state.board
+    w = board.width
+    me = state.player_pos(state.turn)
     opp = state.player_pos(state.other_player())
-    start_card = state.board.at(*me)
-    steps = card_steps(start_card)
-    dests = enumerate_destinations(state, me, steps, opp)
-    return sorted(dests)
+    start_idx = me[0] * w + me[1]
+    opp_idx = opp[0] * w + opp[1]
+    steps = board.steps[start_idx]
+    if (_native_destinations() if (w == 4 and board.height == 4) else _native_destinations_grid()) is not None:
+        return _destinations_cached(w, board.height, state.collapsed_mask, start_idx, steps, opp_idx) != 0
+    neigh = board.neighbor_idx
+    blocked = state.collapsed_mask
+    stack = [(start_idx, steps, 1 << start_idx)]
+    while stack:
+        current, remaining, visited = stack.pop()
+        if remaining == 0:
+            if current != start_idx and current != opp_idx:
+                return True
+            continue
+        avoid = blocked | visited
+        for nxt in neigh[current]:
+            bit = 1 << nxt
+            if not avoid & bit:
+                stack.append((nxt, remaining - 1, visited | bit))
+    return False
 
 
 def apply_move(state: GameState, dest: Coord) -> GameState:
     """Applies a move to the game state and returns the new state."""
+    return _apply_move_cached(state, (dest[0], dest[1]))
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _apply_move_cached(state: GameState, dest: Coord) -> GameState:
+    # Bounded memo: the heuristic (opponent_move_count_after), the app's solve/apply
+    # sequence and the CLI often apply the same move to the same state more than once.
     player = state.turn
-    me = state.player_pos(player)
-    opp = state.player_pos(state.other_player())
+    if player == 1:
+        me, opp = state.p1, state.p2
+    else:
+        me, opp = state.p2, state.p1
     # The player's starting card is collapsed.
-    new_collapsed: Set[Coord] = set(state.collapsed)
-    new_collapsed.add(me)
+    w = state.board.width
+    me_idx = me[0] * w + me[1]
+    me_bit = 1 << me_idx
+    mask = state.collapsed_mask
+    # Incremental Zobrist update: move the player, flip the side to move (and collapse `me` below).
+    dest_idx = dest[0] * w + dest[1]
+    zob = _ZOB_P1 if player == 1 else _ZOB_P2
+    h = state.hash_key ^ zob[me_idx & 63] ^ zob[dest_idx & 63] ^ _ZOB_TURN
+    if mask & me_bit:
+        new_mask = mask
+        new_collapsed = state.collapsed
+    else:
+        new_mask = mask | me_bit
+        h ^= _ZOB_COLLAPSE[me_idx & 63]
+        # The tuple is kept in row-major order, so a single insertion keeps it sorted.
+        collapsed = state.collapsed
+        pos = bisect.bisect_left(collapsed, me)
+        new_collapsed = collapsed[:pos] + (me,) + collapsed[pos:]
     if player == 1:
-        return GameState(state.board, tuple(sorted(new_collapsed)), dest, opp, 2)
+        return _make_state(state.board, new_collapsed, new_mask, dest, opp, 2, h)
     else:
-        return GameState(state.board, tuple(sorted(new_collapsed)), opp, dest, 1)
+        return _make_state(state.board, new_collapsed, new_mask, opp, dest, 1, h)
+
+
+def _make_state(board: Board, collapsed: Tuple[Coord, ...], collapsed_mask: int, p1: Coord, p2: Coord, turn: int,
+                hash_key: int) -> GameState:
+    """Builds a GameState with precomputed derived fields, skipping __post_init__."""
+    state = object.__new__(GameState)
+    setattr_ = object.__setattr__
+    setattr_(state, 'board', board)
+    setattr_(state, 'collapsed', collapsed)
+    setattr_(state, 'p1', p1)
+    setattr_(state, 'p2', p2)
+    setattr_(state, 'turn', turn)
+    setattr_(state, 'collapsed_mask', collapsed_mask)
+    setattr_(state, 'hash_key', hash_key)
+    return state
 
 
 def find_example_path(state: GameState, dest: Coord) -> Optional[List[Coord]]:
     """Finds an example of a valid orthogonal path for a given move."""
-    me = state.player_pos(state.turn)
-    opp = state.player_pos(state.other_player())
-    steps = card_steps(state.board.at(*me))
-    blocked: Set[Coord] = set(state.collapsed)
+    path = _example_path(state, (dest[0], dest[1]))
+    return list(path) if path is not None else None
 
-    visited: Set[Coord] = set([me])
-    path: List[Coord] = [me]
-    found: Optional[List[Coord]] = None
 
-    def dfs(current: Coord, remaining: int) -> None:
-        nonlocal found
-        if found is not None:
-            return
+@functools.lru_cache(maxsize=1024)
+def _example_path(state: GameState, dest: Coord) -> Optional[Tuple[Coord, ...]]:
+    # Memoized so showing a path and re-checking the same move does not repeat the search.
+    w = state.board.width
+    dest_idx = dest[0] * w + dest[1]
+    # The memoized destination mask rules out illegal targets without any path search.
+    if not (0 <= dest[0] < state.board.height and 0 <= dest[1] < w) or not (_legal_move_mask(state) >> dest_idx) & 1:
+        return None
+    me = state.p1 if state.turn == 1 else state.p2
+    start_idx = me[0] * w + me[1]
+    path = _first_path_to(state.board.neighbor_idx, state.collapsed_mask, start_idx,
+                          state.board.steps[start_idx], dest_idx)
+    return tuple(divmod(idx, w) for idx in path) if path is not None else None
+
+
+def _first_path_to(neigh: Tuple[Tuple[int, ...], ...], blocked: int, start_idx: int, steps: int,
+                   dest_idx: int) -> Optional[Tuple[int, ...]]:
+    """The first index path (in _destination_paths order) of exactly `steps` moves ending on
+    dest_idx, stopping at the first hit. Paths never revisit a cell, so branches that would
+    pass through dest early are cut."""
+    stack = [(start_idx, steps, 1 << start_idx, (start_idx,))]
+    while stack:
+        current, remaining, visited, path = stack.pop()
         if remaining == 0:
-            if current == dest and current != me and current != opp:
-                found = list(path)
-            return
-        for nxt in neighbors(state.board, current):
-            if nxt in blocked or nxt in visited:
-                continue
-            visited.add(nxt)
-            path.append(nxt)
-            dfs(nxt, remaining - 1)
-            path.pop()
-            visited.remove(nxt)
-
-    dfs(me, steps)
-    return found
+            return path
+        avoid = blocked | visited
+        last = remaining == 1
+        for nxt in reversed(neigh[current]):
+            bit = 1 << nxt
+            if not avoid & bit and (nxt == dest_idx) == last:
+                stack.append((nxt, remaining - 1, visited | bit, path + (nxt,)))
+    return None
 
 
-@dataclass
+@dataclass(slots=True)
 class SolveResult:
     """Result of solving using the C++ engine."""
     win: bool
@@ -236,7 +632,10 @@ class SolveResult:
 def opponent_move_count_after(state: GameState, my_move: Coord) -> int:
     """Calculates the number of legal moves the opponent has after a given move."""
     next_state = apply_move(state, my_move)
-    return len(legal_moves(next_state))
+    cached = _LEGAL_CACHE.get(next_state)
+    if cached is not None:
+        return len(cached)
+    return _legal_move_mask(next_state).bit_count()
 
 
 def choose_child_by_heuristic(state: GameState, moves: List[Coord]) -> List[Coord]:
@@ -291,25 +690,27 @@ def _coord_to_str(c: Coord) -> str:
     return f"{c[0]},{c[1]}"
 
 
-def _coords_to_str(collapsed: Tuple[Coord, ...]) -> str:
-    """Converts a set of collapsed coordinates to a string."""
-    return ';'.join(_coord_to_str(c) for c in collapsed)
-
-
 def _shift_coord(c: Coord, dr: int, dc: int, w: int, h: int) -> Coord:
     r, c0 = c
     return ((r + dr) % h, (c0 + dc) % w)
 
 
+@functools.lru_cache(maxsize=4096)
+def _grid_bytes(grid: Tuple[Card, ...]) -> bytes:
+    """ASCII bytes of a grid (cards are single characters), cached per grid."""
+    return ''.join(grid).encode('ascii')
+
+
 def _shift_grid_str(grid: Tuple[Card, ...], w: int, h: int, dr: int, dc: int) -> str:
-    # Build shifted grid string row-major
-    s: List[str] = []
+    # Build shifted grid string row-major into a preallocated buffer
+    src = _grid_bytes(grid)
+    out = bytearray(w * h)
     for r in range(h):
+        base = r * w
+        src_base = ((r - dr) % h) * w
         for c in range(w):
-            sr = (r - dr) % h
-            sc = (c - dc) % w
-            s.append(grid[sr * w + sc])
-    return ''.join(s)
+            out[base + c] = src[src_base + (c - dc) % w]
+    return out.decode('ascii')
 
 
 def _normalize_for_torus(state: GameState) -> Tuple[str, Coord, Coord, Tuple[Coord, ...], int, int]:
@@ -322,7 +723,14 @@ def _normalize_for_torus(state: GameState) -> Tuple[str, Coord, Coord, Tuple[Coo
     grid_str = _shift_grid_str(state.board.grid, w, h, dr, dc)
     norm_p1 = (0, 0)
     norm_p2 = _shift_coord(state.p2, dr, dc, w, h)
-    norm_collapsed = tuple(sorted((_shift_coord(c, dr, dc, w, h) for c in state.collapsed)))
+    # Shift the collapsed mask and decode it: bits come out in row-major order, so no sort is needed.
+    if w == 4 and h == 4:
+        norm_mask = _torus_shift16(state.collapsed_mask, dr, dc)
+    else:
+        norm_mask = 0
+        for (r, c) in state.collapsed:
+            norm_mask |= 1 << (((r + dr) % h) * w + (c + dc) % w)
+    norm_collapsed = tuple(_mask_to_coords(norm_mask, w))
     return grid_str, norm_p1, norm_p2, norm_collapsed, dr, dc
 
 
@@ -335,27 +743,60 @@ def normalize_for_torus_view(state: GameState) -> Tuple[Board, Coord, Coord, Tup
     return norm_board, norm_p1, norm_p2, norm_collapsed, dr, dc
 
 
+def _torus_shift16(mask: int, dr: int, dc: int) -> int:
+    """Shift a 4x4 bitboard on the torus so bit (r, c) moves to ((r+dr)%4, (c+dc)%4)."""
+    if dr:
+        mask = ((mask << (4 * dr)) | (mask >> (16 - 4 * dr))) & 0xFFFF
+    if dc:
+        keep = ((0xF << dc) & 0xF) * 0x1111
+        wrap = ((1 << dc) - 1) * 0x1111
+        mask = ((mask << dc) & keep) | ((mask >> (4 - dc)) & wrap)
+    return mask
+
+
+def _normalize_for_torus_key(state: GameState) -> int:
+    """Return the 64-bit hash of the torus-normalized state (X shifted to (0,0)).
+    Works directly on bitboards, so no shifted grid/Board/GameState is built."""
+    a, b2, b3, b4, _x, o, c, turn = _state_bitboards(state)
+    dr = (-state.p1[0]) % 4
+    dc = (-state.p1[1]) % 4
+    return _hash_state64((
+        _torus_shift16(a, dr, dc), _torus_shift16(b2, dr, dc),
+        _torus_shift16(b3, dr, dc), _torus_shift16(b4, dr, dc),
+        1, _torus_shift16(o, dr, dc), _torus_shift16(c, dr, dc), turn,
+    ))
+
+
 def _state_key(state: GameState) -> str:
     """Generates a compact key: 64-bit hash from bitboards using Szudzik+SplitMix64.
     Omits width/height (assume 4x4), and stores only the hash as hex + turn.
     Uses torus normalization by shifting so X at (0,0) before hashing.
     """
-    # shift so X at (0,0)
-    w, h = state.board.width, state.board.height
-    grid_str, norm_p1, norm_p2, norm_collapsed, dr, dc = _normalize_for_torus(state)
-    norm_board = Board(width=w, height=h, grid=tuple(grid_str))
-    norm_state = GameState(board=norm_board, collapsed=norm_collapsed, p1=norm_p1, p2=norm_p2, turn=state.turn)
-    a, b2, b3, b4, x, o, c, turn = _state_bitboards(norm_state)
-    key64 = _hash_state64((a, b2, b3, b4, x, o, c, turn))
-    return f"{key64:016x}|{turn}"
+    return f"{_normalize_for_torus_key(state):016x}|{0 if state.turn == 1 else 1}"
+
+
+_STATE_KEY_STRUCT = struct.Struct('<QB')
+
+
+def _state_key_blob(state: GameState) -> bytes:
+    """Binary form of _state_key for the SQLite primary key: little-endian u64 hash + u8 turn (9 bytes)."""
+    return _STATE_KEY_STRUCT.pack(_normalize_for_torus_key(state), 0 if state.turn == 1 else 1)
+
 
+# Resolved DB paths whose schema was created/migrated by this process; later connections skip it.
+_SCHEMA_READY: Set[str] = set()
 
-def _ensure_db(conn: sqlite3.Connection) -> None:
-    """Ensures the database table for storing game states exists and is up to date."""
+
+def _ensure_db(conn: sqlite3.Connection, db_path: Optional[str] = None) -> None:
+    """Ensures the database table for storing game states exists and is up to date.
+    With `db_path`, the check runs once per path per process."""
+    ready_key = os.path.abspath(db_path) if db_path else None
+    if ready_key is not None and ready_key in _SCHEMA_READY:
+        return
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS states (
-            key TEXT PRIMARY KEY,
+            key BLOB PRIMARY KEY,
             width INTEGER NOT NULL,
             height INTEGER NOT NULL,
             grid TEXT NOT NULL,
@@ -376,17 +817,59 @@ def _ensure_db(conn: sqlite3.Connection) -> None:
     if 'plies' not in cols:
         conn.execute("ALTER TABLE states ADD COLUMN plies INTEGER")
     conn.commit()
+    if ready_key is not None:
+        _SCHEMA_READY.add(ready_key)
+
+
+def _state_row(state: GameState, win: bool, best_move: Optional[Coord], plies: Optional[int]) -> Tuple[Any, ...]:
+    """Builds the `states` row for a solved state. Uses compact key and stores minimal fields."""
+    best_move_str = _coord_to_str(best_move) if best_move is not None else None
+    # Store minimal columns; keep backward-compatible columns filled minimally
+    return (
+        _state_key_blob(state),
+        4,
+        4,
+        '',
+        '',
+        '',
+        '',
+        state.turn,
+        1 if win else 0,
+        best_move_str,
+        datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        plies if plies is not None else None,
+    )
 
 
-def db_lookup_state(db_path: str, key: str) -> Optional[Tuple[bool, Optional[Coord], Optional[int]]]:
-    """Looks up a solved state from the database."""
-    resolved = _resolve_db_path(db_path)
-    _ensure_db_dir(resolved)
-    conn = sqlite3.connect(resolved)
-    try:
-        _ensure_db(conn)
-        cur = conn.execute("SELECT win, best_move, plies FROM states WHERE key = ?", (key,))
-        row = cur.fetchone()
+class StateCache:
+    """
+    Solved-state table behind one persistent autocommit SQLite connection (WAL, synchronous=NORMAL).
+    Writes open an explicit transaction that is committed every `batch_size` stores, on
+    flush()/close(), or on leaving a `with` block; lookups on the same cache see uncommitted rows.
+    Safe to share across threads.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 64) -> None:
+        self.db_path = _resolve_db_path(db_path)
+        _ensure_db_dir(self.db_path)
+        self.batch_size = max(1, batch_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+        if not os.path.exists(self.db_path):
+            # A new (or since removed) file needs the schema even if this path was set up before.
+            _SCHEMA_READY.discard(os.path.abspath(self.db_path))
+        # Autocommit mode: lookups run without the driver's implicit transaction handling and
+        # writes open an explicit BEGIN that spans a whole batch.
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        _ensure_db(self._conn, self.db_path)
+
+    def lookup(self, key: bytes) -> Optional[Tuple[bool, Optional[Coord], Optional[int]]]:
+        """Looks up a solved state by its packed key (see _state_key_blob)."""
+        with self._lock:
+            row = self._conn.execute("SELECT win, best_move, plies FROM states WHERE key = ?", (key,)).fetchone()
         if not row:
             return None
         win_int, best_move_str, plies_val = row
@@ -398,46 +881,94 @@ def db_lookup_state(db_path: str, key: str) -> Optional[Tuple[bool, Optional[Coo
             best_move = (int(r_s), int(c_s))
         plies: Optional[int] = int(plies_val) if plies_val is not None else None
         return (bool(win_int), best_move, plies)
-    finally:
-        conn.close()
+
+    def store(self, state: GameState, win: bool, best_move: Optional[Coord], plies: Optional[int]) -> None:
+        """Stores one solved state."""
+        self.store_many([(state, win, best_move, plies)])
+
+    def store_many(self, rows: Iterable[Tuple[GameState, bool, Optional[Coord], Optional[int]]]) -> None:
+        """Stores (state, win, best_move, plies) tuples with a single executemany."""
+        params = [_state_row(*row) for row in rows]
+        if not params:
+            return
+        with self._lock:
+            if not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO states
+                (key, width, height, grid, p1, p2, collapsed, turn, win, best_move, solved_at, plies)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                params,
+            )
+            self._pending += len(params)
+            if self._pending >= self.batch_size:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self) -> None:
+        """Commits any pending writes."""
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self) -> None:
+        """Commits pending writes and closes the connection."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> 'StateCache':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# Only the server's default DB (COLLAPSI_DB, as in app.py) and ':memory:' keep one shared
+# connection each, committing every store (for ':memory:' that is what makes stored rows
+# visible to later calls); any other path gets a per-call connection that is closed again.
+_DEFAULT_STATE_DB = os.getenv('COLLAPSI_DB', 'collapsi.db')
+_SHARED_STATE_DBS = (_DEFAULT_STATE_DB, ':memory:')
+_SHARED_STATE_CACHES: Dict[str, StateCache] = {}
+_STATE_CACHES_LOCK = threading.Lock()
+
+
+@contextmanager
+def _state_cache_for(db_path: str) -> Iterator[StateCache]:
+    if db_path in _SHARED_STATE_DBS:
+        with _STATE_CACHES_LOCK:
+            cache = _SHARED_STATE_CACHES.get(db_path)
+            if cache is None:
+                cache = StateCache(db_path, batch_size=1)
+                _SHARED_STATE_CACHES[db_path] = cache
+        yield cache
+    else:
+        with StateCache(db_path, batch_size=1) as cache:
+            yield cache
+
+
+def db_lookup_state(db_path: str, key: bytes) -> Optional[Tuple[bool, Optional[Coord], Optional[int]]]:
+    """Looks up a solved state from the database by its packed key (see _state_key_blob)."""
+    with _state_cache_for(db_path) as cache:
+        return cache.lookup(key)
 
 
 def db_store_state(db_path: str, state: GameState, win: bool, best_move: Optional[Coord], plies: Optional[int]) -> None:
     """Stores a solved game state in the database. Uses compact key and stores minimal fields."""
-    resolved = _resolve_db_path(db_path)
-    _ensure_db_dir(resolved)
-    conn = sqlite3.connect(resolved)
-    try:
-        _ensure_db(conn)
-        key = _state_key(state)
-        best_move_str = _coord_to_str(best_move) if best_move is not None else None
-        # Store minimal columns; keep backward-compatible columns filled minimally
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO states
-            (key, width, height, grid, p1, p2, collapsed, turn, win, best_move, solved_at, plies)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                key,
-                4,
-                4,
-                '',
-                '',
-                '',
-                '',
-                state.turn,
-                1 if win else 0,
-                best_move_str,
-                datetime.utcnow().isoformat(timespec='seconds') + 'Z',
-                plies if plies is not None else None,
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    with _state_cache_for(db_path) as cache:
+        cache.store(state, win, best_move, plies)
 
 
+def db_store_many(db_path: str, rows: Iterable[Tuple[GameState, bool, Optional[Coord], Optional[int]]]) -> None:
+    """Stores many (state, win, best_move, plies) rows with one executemany and a single commit."""
+    with _state_cache_for(db_path) as cache:
+        cache.store_many(rows)
+
+
+@functools.lru_cache(maxsize=1)
 def _find_cpp_exe() -> Optional[str]:
     """
     Resolve the native solver path with strong defaults for Render.
@@ -447,6 +978,8 @@ def _find_cpp_exe() -> Optional[str]:
     3) Common build outputs relative to codebase
     4) PATH lookup (collapsi_cpp[.exe])
     Set COLLAPSI_DEBUG=1 to print resolution trace.
+    The result is memoized for the process; call _find_cpp_exe.cache_clear() to re-resolve
+    (e.g. after changing the env vars above).
     """
     debug = os.getenv('COLLAPSI_DEBUG', '0').lower() in ('1', 'true', 'yes', 'on')
 
@@ -514,35 +1047,173 @@ def _find_cpp_exe() -> Optional[str]:
     return None
 
 
+@functools.lru_cache(maxsize=1)
+def _find_cpp_lib() -> Optional[str]:
+    """
+    Resolve the in-process solver library (libcollapsi.so / collapsi.dll).
+    Order: COLLAPSI_CPP_LIB env var, Render default, common build outputs, then next to the CLI.
+    Memoized like _find_cpp_exe; call _find_cpp_lib.cache_clear() to re-resolve.
+    """
+    env = os.getenv('COLLAPSI_CPP_LIB')
+    if env and os.path.isfile(env):
+        return env
+    names = ('libcollapsi.so', 'libcollapsi.dylib', 'collapsi.dll')
+    base = os.path.dirname(__file__)
+    dirs = [
+        '/opt/render/project/src',
+        os.path.join(base, 'cpp', 'build'),
+        os.path.join(base, 'cpp', 'build', 'Release'),
+        os.path.join(base, 'cpp', 'build-ninja'),
+        os.path.join(base, 'cpp', 'build-deploy'),
+        os.path.join(base, 'cpp', 'build-deploy', 'Release'),
+    ]
+    exe = _find_cpp_exe()
+    if exe:
+        dirs.append(os.path.dirname(exe))
+    for d in dirs:
+        for name in names:
+            p = os.path.join(d, name)
+            if os.path.isfile(p):
+                return p
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _load_cpp_lib() -> Optional[ctypes.CDLL]:
+    """Load the solver library and declare collapsi_solve(); None if unavailable."""
+    path = _find_cpp_lib()
+    if not path:
+        return None
+    try:
+        lib = ctypes.CDLL(path)
+        lib.collapsi_solve.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)
+        lib.collapsi_solve.restype = ctypes.c_int
+        return lib
+    except (OSError, AttributeError):
+        return None
+
+
+# Engine output lines per encoded state, so solve_with_cache, solve_moves_cpp and ai_pick_move
+# on the same position share one native solve. Cleared wholesale when it grows past the cap.
+_CPP_LINES: Dict[str, str] = {}
+_CPP_LINES_MAX = 1 << 14
+
+
+def _run_cpp(arg: str) -> Optional[str]:
+    """
+    Solve one encoded state with the native engine and return its output line
+    ("win best plies timeus | move:plies:win ..."). Calls the shared library in-process
+    when it is available, otherwise runs the CLI. Returns None if neither is found.
+    Non-empty results are memoized per arg (see _CPP_LINES).
+    """
+    line = _CPP_LINES.get(arg)
+    if line is None:
+        line = _run_cpp_uncached(arg)
+        if line:
+            if len(_CPP_LINES) >= _CPP_LINES_MAX:
+                _CPP_LINES.clear()
+            _CPP_LINES[arg] = line
+    return line
+
+
+class _CppSolverProc:
+    """
+    A long-running `collapsi_cpp --server` child answering one state per line, so CLI solves
+    skip the fork+exec per position. Started lazily; if the binary predates --server (no
+    "ready" handshake) or the pipe breaks, the process is dropped and solve() returns None.
+    """
+
+    def __init__(self) -> None:
+        self._proc: Optional[subprocess.Popen] = None
+        self._exe: Optional[str] = None
+        self._unsupported: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _start(self, exe: str) -> Optional[subprocess.Popen]:
+        if self._proc is not None and self._exe == exe and self._proc.poll() is None:
+            return self._proc
+        self._stop()
+        if exe in self._unsupported:
+            return None
+        try:
+            proc = subprocess.Popen([exe, '--server'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError:
+            self._unsupported.add(exe)
+            return None
+        if (proc.stdout.readline() or '').strip() != 'ready':
+            self._unsupported.add(exe)
+            self._kill(proc)
+            return None
+        self._proc, self._exe = proc, exe
+        return proc
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen) -> None:
+        try:
+            proc.kill()
+            proc.wait(timeout=5)
+        except Exception:
+            pass
+
+    def _stop(self) -> None:
+        if self._proc is not None:
+            self._kill(self._proc)
+        self._proc = None
+        self._exe = None
+
+    def solve(self, exe: str, arg: str) -> Optional[str]:
+        with self._lock:
+            proc = self._start(exe)
+            if proc is None:
+                return None
+            try:
+                proc.stdin.write(arg + '\n')
+                proc.stdin.flush()
+                line = proc.stdout.readline()
+            except (OSError, ValueError):
+                line = ''
+            if not line:
+                self._stop()
+                return None
+            return line.strip()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+_CPP_SERVER = _CppSolverProc()
+atexit.register(_CPP_SERVER.close)
+
+
+def _run_cpp_uncached(arg: str) -> Optional[str]:
+    lib = _load_cpp_lib()
+    if lib is not None:
+        buf = ctypes.create_string_buffer(1024)
+        if lib.collapsi_solve(arg.encode('ascii'), buf, len(buf)) >= 0:
+            return buf.value.decode('ascii')
+    exe = _find_cpp_exe()
+    if not exe:
+        return None
+    line = _CPP_SERVER.solve(exe, arg)
+    if line is not None:
+        return line
+    proc = subprocess.run([exe, '--state', arg], capture_output=True, text=True, check=False)
+    return (proc.stdout or '').strip()
+
+
+# --state text for the native engine: seven 16-bit bitboards then the side to move.
+_CPP_ARG_FMT = "%04x,%04x,%04x,%04x,%04x,%04x,%04x,%01x"
+
+
+@functools.lru_cache(maxsize=65536)
 def _state_to_cpp_arg(state: GameState) -> str:
-    # Only 4x4 supported by C++ solver
-    w = state.board.width
-    h = state.board.height
-    if w != 4 or h != 4:
+    # Memoized per state: the same position is typically encoded for the solve,
+    # the per-move metrics and the AI pick. Only 4x4 supported by C++ solver.
+    if state.board.width != 4 or state.board.height != 4:
         raise ValueError('C++ solver supports 4x4 only')
-    a = 0
-    b2 = 0
-    b3 = 0
-    b4 = 0
-    for r in range(4):
-        for c in range(4):
-            idx = r * 4 + c
-            card = state.board.at(r, c)
-            if card in ('A', 'J'):
-                a |= (1 << idx)
-            elif card == '2':
-                b2 |= (1 << idx)
-            elif card == '3':
-                b3 |= (1 << idx)
-            elif card == '4':
-                b4 |= (1 << idx)
-    x = (1 << (state.p1[0] * 4 + state.p1[1]))
-    o = (1 << (state.p2[0] * 4 + state.p2[1]))
-    c = 0
-    for (rr, cc) in state.collapsed:
-        c |= (1 << (rr * 4 + cc))
-    turn = 0 if state.turn == 1 else 1
-    return f"{a:04x},{b2:04x},{b3:04x},{b4:04x},{x:04x},{o:04x},{c:04x},{turn:01x}"
+    return _CPP_ARG_FMT % _state_bitboards(state)
 
 
 def _state_bitboards(state: GameState) -> Tuple[int, int, int, int, int, int, int, int]:
@@ -551,24 +1222,10 @@ def _state_bitboards(state: GameState) -> Tuple[int, int, int, int, int, int, in
     h = state.board.height
     if w != 4 or h != 4:
         raise ValueError('Only 4x4 supported for bitboard hashing')
-    a = b2 = b3 = b4 = 0
-    for r in range(4):
-        for c in range(4):
-            idx = r * 4 + c
-            card = state.board.at(r, c)
-            if card in ('A', 'J'):
-                a |= (1 << idx)
-            elif card == '2':
-                b2 |= (1 << idx)
-            elif card == '3':
-                b3 |= (1 << idx)
-            elif card == '4':
-                b4 |= (1 << idx)
+    a, b2, b3, b4 = state.board.card_masks
     x = (1 << (state.p1[0] * 4 + state.p1[1]))
     o = (1 << (state.p2[0] * 4 + state.p2[1]))
-    c = 0
-    for (rr, cc) in state.collapsed:
-        c |= (1 << (rr * 4 + cc))
+    c = state.collapsed_mask
     turn = 0 if state.turn == 1 else 1
     return a, b2, b3, b4, x, o, c, turn
 
@@ -616,17 +1273,20 @@ def _decode_best_move_byte(val: int) -> Optional[Coord]:
 
 def solve_with_cache(state: GameState, db_path: str, depth_cap: Optional[int] = None) -> SolveResult:
     """
-    Canonical solver: must use the native C++ CLI. No heuristic or DB fallbacks.
-    - Parses plies/best from the CLI and writes (win, plies) to SQLite under the normalized key.
+    Canonical solver: must use the native C++ engine (shared library or CLI). No heuristic or DB fallbacks.
+    - Parses plies/best from the engine output and writes (win, plies) to SQLite under the normalized key.
     - Does not persist best_move because normalized keys omit raw alignment.
     """
-    # Always require CLI
+    # Always require the native engine
     arg = _state_to_cpp_arg(state)  # may raise for non-4x4
-    exe = _find_cpp_exe()
-    if not exe:
-        raise RuntimeError("C++ solver executable not found. Build it and/or set COLLAPSI_CPP_EXE.")
-    proc = subprocess.run([exe, '--state', arg], capture_output=True, text=True, check=False)
-    line = (proc.stdout or '').strip()
+    line = _run_cpp(arg)
+    if line is None:
+        raise RuntimeError("C++ solver not found. Build it and/or set COLLAPSI_CPP_EXE or COLLAPSI_CPP_LIB.")
+    return _solve_result_from_line(state, db_path, line)
+
+
+def _solve_result_from_line(state: GameState, db_path: str, line: str) -> SolveResult:
+    """Root verdict from an engine output line (see solve_with_cache), persisted to SQLite."""
     parts = line.split('|')
     head = parts[0].strip().split()
     if len(head) < 3 or head[0] not in ('0', '1'):
@@ -651,51 +1311,81 @@ def solve_with_cache(state: GameState, db_path: str, depth_cap: Optional[int] =
 
 def solve_moves_cpp(state: GameState) -> List[Dict[str, Any]]:
     """Returns per-legal-move plies/win from the C++ solver's detailed output."""
-    items: List[Dict[str, Any]] = []
     try:
         arg = _state_to_cpp_arg(state)
     except Exception:
-        return items
-    exe = _find_cpp_exe()
-    if not exe:
-        return items
+        return []
     try:
-        proc = subprocess.run([exe, '--state', arg], capture_output=True, text=True, check=False)
-        line = (proc.stdout or '').strip()
-        parts = line.split('|')
-        if len(parts) < 2:
-            return items
-        tail = parts[1].strip()
-        if not tail:
-            return items
-        for tok in tail.split():
-            try:
-                m_str, p_str, w_str = tok.split(':')
-                m_val = int(m_str)
-                p_val = int(p_str)
-                w_val = int(w_str)
-                to_idx = m_val & 0xF
-                r = to_idx // 4
-                c = to_idx % 4
-                items.append({'move': [r, c], 'win': bool(w_val), 'plies': p_val})
-            except Exception:
-                continue
+        line = _run_cpp(arg)
     except Exception:
+        return []
+    return _moves_from_line(line) if line else []
+
+
+def _moves_from_line(line: str) -> List[Dict[str, Any]]:
+    """Per-move entries ({'move': [r, c], 'win', 'plies'}) from an engine output line's tail."""
+    items: List[Dict[str, Any]] = []
+    parts = line.split('|')
+    if len(parts) < 2:
         return items
+    tail = parts[1].strip()
+    if not tail:
+        return items
+    for tok in tail.split():
+        try:
+            m_str, p_str, w_str = tok.split(':')
+            m_val = int(m_str)
+            p_val = int(p_str)
+            w_val = int(w_str)
+            to_idx = m_val & 0xF
+            r = to_idx // 4
+            c = to_idx % 4
+            items.append({'move': [r, c], 'win': bool(w_val), 'plies': p_val})
+        except Exception:
+            continue
     return items
 
 
+def solve_with_cache_and_moves(state: GameState, db_path: str) -> Tuple[SolveResult, List[Dict[str, Any]]]:
+    """solve_with_cache and solve_moves_cpp for one state from a single engine output line."""
+    arg = _state_to_cpp_arg(state)  # may raise for non-4x4
+    line = _run_cpp(arg)
+    if line is None:
+        raise RuntimeError("C++ solver not found. Build it and/or set COLLAPSI_CPP_EXE or COLLAPSI_CPP_LIB.")
+    return _solve_result_from_line(state, db_path, line), _moves_from_line(line)
+
+
 def choose_ai_side_for_board(board: Board, p1: Coord, p2: Coord, db_path: str) -> int:
-    """Determines which side the AI should play, based on which player has a cached win."""
+    """Determines which side the AI should play, based on which player has a cached win.
+    With the in-process library on a multi-core host the Player 2 root solve starts alongside
+    Player 1's (the native call releases the GIL); if Player 1 wins we return without waiting
+    for it. The CLI fallbacks serialize solves, so there Player 2 is only solved if needed; the
+    same serial path is taken while the worker is busy with another call's speculative solve."""
     state_p1 = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=1)
+    state_p2 = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=2)
+    fut_p2 = None
+    if (_ROOT_SOLVE_POOL is not None and _load_cpp_lib() is not None
+            and _ROOT_SOLVE_IDLE.acquire(blocking=False)):
+        fut_p2 = _ROOT_SOLVE_POOL.submit(solve_with_cache, state_p2, db_path)
+        fut_p2.add_done_callback(lambda _f: _ROOT_SOLVE_IDLE.release())
     res_p1 = solve_with_cache(state_p1, db_path)
     if res_p1.win:
         return 1
-    state_p2 = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=2)
-    res_p2 = solve_with_cache(state_p2, db_path)
+    res_p2 = fut_p2.result() if fut_p2 is not None else solve_with_cache(state_p2, db_path)
     return 2 if res_p2.win else 1  # Default to Player 1 if neither side has a cached win.
 
 
+# Worker thread for independent root solves (see choose_ai_side_for_board); on a single core
+# the speculative solve would only compete with the one we wait for, so it is disabled there.
+_USABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+_ROOT_SOLVE_POOL: Optional[concurrent.futures.ThreadPoolExecutor] = (
+    concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='collapsi-root')
+    if _USABLE_CPUS > 1 else None
+)
+# Held while the worker runs a solve, so a speculative solve never queues behind another one.
+_ROOT_SOLVE_IDLE = threading.Lock()
+
+
 def ai_pick_move(state: GameState, db_path: str) -> Optional[Coord]:
     """Picks the best move for the AI by solving the current game state."""
     res = solve_with_cache(state, db_path)
@@ -761,8 +1451,7 @@ def main() -> None:
             print('Illegal move. Try again.')
 
     while True:
-        moves_me = legal_moves(state)
-        if not moves_me:
+        if not has_any_legal_move(state):
             winner = state.other_player()
             print(f"Player {winner} wins!")
             break
@@ -794,7 +1483,7 @@ def main() -> None:
                 if path is not None:
                     print('AI path:', path)
             state = apply_move(state, move)
-            print(board.pretty(state.p1, state.p2, set(state.collapsed)))
+            print(board.pretty(state.p1, state.p2, state.collapsed_mask))
         else:
             move = prompt_human_move(state)
             if args.show_paths:
@@ -802,7 +1491,7 @@ def main() -> None:
                 if path is not None:
                     print('Your path:', path)
             state = apply_move(state, move)
-            print(board.pretty(state.p1, state.p2, set(state.collapsed)))
+            print(board.pretty(state.p1, state.p2, state.collapsed_mask))
 
 
 if __name__ == '__main__':
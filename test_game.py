@@ -5,9 +5,16 @@ from game import (
     GameState,
     card_steps,
     legal_moves,
+    enumerate_destinations,
+    enumerate_destinations_mask,
+    opponent_move_count_after,
+    has_any_legal_move,
     apply_move,
     deal_board_3x3,
     find_example_path,
+    db_store_state,
+    db_lookup_state,
+    _state_key_blob,
 )
 
 
@@ -21,6 +28,15 @@ def make_board(rows):
     return Board(width=w, height=h, grid=tuple(flat))
 
 
+# Shared fixture boards (Board is immutable, so tests can reuse one instance).
+BOARD_4X4_A_CORNER = make_board([
+    ['A', '2', '2', '2'],
+    ['2', '2', '2', '2'],
+    ['2', '2', '2', '2'],
+    ['2', '2', '2', '2'],
+])
+
+
 class TestCollapsiBasics(unittest.TestCase):
     def test_card_steps_values(self):
         self.assertEqual(card_steps('J'), 1)
@@ -30,12 +46,7 @@ class TestCollapsiBasics(unittest.TestCase):
         self.assertEqual(card_steps('4'), 4)
 
     def test_wrap_around_moves_from_corner(self):
-        board = make_board([
-            ['A', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-        ])
+        board = BOARD_4X4_A_CORNER
         p1 = (0, 0)
         p2 = (1, 1)
         state = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=1)
@@ -43,14 +54,10 @@ class TestCollapsiBasics(unittest.TestCase):
         # Step=1 from (0,0): expect wrap to (0,3) and (3,0) available
         self.assertIn((0, 3), moves)
         self.assertIn((3, 0), moves)
+        self.assertTrue(has_any_legal_move(state))
 
     def test_cannot_end_on_opponent(self):
-        board = make_board([
-            ['A', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-        ])
+        board = BOARD_4X4_A_CORNER
         p1 = (0, 1)
         p2 = (0, 0)  # opponent adjacent
         state = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=1)
@@ -58,34 +65,80 @@ class TestCollapsiBasics(unittest.TestCase):
         self.assertNotIn(p2, moves)
 
     def test_apply_move_collapses_and_switches_turn(self):
-        board = make_board([
-            ['A', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-            ['2', '2', '2', '2'],
-        ])
+        board = BOARD_4X4_A_CORNER
         start = (0, 0)
         p2 = (1, 1)
         state = GameState(board=board, collapsed=tuple(), p1=start, p2=p2, turn=1)
         # Move right by 1
         new_state = apply_move(state, (0, 1))
         self.assertEqual(new_state.turn, 2)
-        self.assertIn(start, set(new_state.collapsed))
+        self.assertIn(start, new_state.collapsed)
         self.assertEqual(new_state.p1, (0, 1))
         self.assertEqual(new_state.p2, p2)
 
     def test_legal_moves_blocked_by_collapsed(self):
+        board = BOARD_4X4_A_CORNER
+        p1 = (0, 0)
+        p2 = (2, 2)
+        collapsed = ((0, 1), (0, 3), (1, 0), (3, 0))  # all neighbors of p1
+        state = GameState(board=board, collapsed=collapsed, p1=p1, p2=p2, turn=1)
+        self.assertEqual(legal_moves(state), [])
+        self.assertFalse(has_any_legal_move(state))
+
+    def test_destination_mask_matches_set_and_counts(self):
         board = make_board([
-            ['A', '2', '2', '2'],
             ['2', '2', '2', '2'],
+            ['2', 'A', '2', '2'],
+            ['2', '2', '3', '2'],
             ['2', '2', '2', '2'],
+        ])
+        state = GameState(board=board, collapsed=((0, 1),), p1=(0, 0), p2=(2, 2), turn=1)
+        dests = enumerate_destinations(state, (0, 0), 2, (2, 2))
+        mask = enumerate_destinations_mask(state, (0, 0), 2, (2, 2))
+        self.assertEqual(dests, {(r, c) for r in range(4) for c in range(4) if (mask >> (r * 4 + c)) & 1})
+        for move in legal_moves(state):
+            self.assertEqual(opponent_move_count_after(state, move), len(legal_moves(apply_move(state, move))))
+
+    def test_enumerate_destinations_collects_first_paths(self):
+        board = make_board([
+            ['2', '2', '2', '2'],
+            ['2', 'A', '2', '2'],
+            ['2', '2', '3', '2'],
             ['2', '2', '2', '2'],
         ])
-        p1 = (0, 0)
-        p2 = (2, 2)
-        collapsed = {(0, 1), (1, 0), (3, 0), (0, 3)}  # all neighbors of p1
-        state = GameState(board=board, collapsed=tuple(sorted(collapsed)), p1=p1, p2=p2, turn=1)
-        self.assertEqual(legal_moves(state), [])
+        state = GameState(board=board, collapsed=((0, 1),), p1=(0, 0), p2=(2, 2), turn=1)
+        paths = {}
+        dests = enumerate_destinations(state, (0, 0), 2, (2, 2), paths=paths)
+        self.assertEqual(dests, enumerate_destinations(state, (0, 0), 2, (2, 2)))
+        self.assertEqual(set(paths), dests)
+        # P1 stands on a '2', so these are the same searches find_example_path runs per move
+        for dest, path in paths.items():
+            self.assertEqual(tuple(path), tuple(find_example_path(state, dest)))
+
+    def test_is_collapsed_and_order_independent_equality(self):
+        board = BOARD_4X4_A_CORNER
+        state = GameState(board=board, collapsed=((2, 1), (0, 3)), p1=(0, 0), p2=(1, 1), turn=1)
+        self.assertTrue(state.is_collapsed((0, 3)))
+        self.assertTrue(state.is_collapsed((2, 1)))
+        self.assertFalse(state.is_collapsed((0, 0)))
+        same = GameState(board=board, collapsed=((0, 3), (2, 1)), p1=(0, 0), p2=(1, 1), turn=1)
+        self.assertEqual(state, same)
+        self.assertEqual(hash(state), hash(same))
+        self.assertEqual(state.collapsed, ((0, 3), (2, 1)))
+
+    def test_collapsed_off_board_rejected(self):
+        board = BOARD_4X4_A_CORNER
+        for bad in ((-1, 0), (0, 4), (4, 0)):
+            with self.assertRaises(ValueError):
+                GameState(board=board, collapsed=(bad,), p1=(0, 0), p2=(3, 3), turn=1)
+
+    def test_player_off_board_rejected(self):
+        board = BOARD_4X4_A_CORNER
+        for bad in ((-1, 0), (0, -1), (5, 5)):
+            with self.assertRaises(ValueError):
+                GameState(board=board, collapsed=(), p1=bad, p2=(3, 3), turn=1)
+            with self.assertRaises(ValueError):
+                GameState(board=board, collapsed=(), p1=(0, 0), p2=bad, turn=1)
 
 
 class TestAOSolver(unittest.TestCase):
@@ -128,6 +181,12 @@ class TestAOSolver(unittest.TestCase):
             dc = max(-1, min(1, dc))
             self.assertIn((abs(dr), abs(dc)), [(1, 0), (0, 1)])
 
+    def test_memory_db_store_then_lookup(self):
+        # ':memory:' keeps one shared connection, so a stored row is visible to the next call
+        state = GameState(board=BOARD_4X4_A_CORNER, collapsed=((1, 2),), p1=(0, 0), p2=(3, 3), turn=2)
+        db_store_state(':memory:', state, True, (0, 1), 5)
+        self.assertEqual(db_lookup_state(':memory:', _state_key_blob(state)), (True, (0, 1), 5))
+
 
 if __name__ == '__main__':
     unittest.main()
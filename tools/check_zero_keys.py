@@ -13,7 +13,7 @@ HERE = os.path.dirname(__file__)
 if HERE not in sys.path:
     sys.path.insert(0, HERE)
 
-import read_records as rr  # uses iter_solved_records
+import read_records as rr  # uses iter_solved_keys
 
 def main() -> int:
     if len(sys.argv) < 2:
@@ -24,12 +24,12 @@ def main() -> int:
     if not os.path.exists(db):
         print(f"{db} MISSING")
         return 1
+    # Only the key column is decoded; the other record fields are skipped.
     zeros = []
     total = 0
-    for rec in rr.iter_solved_records(db, start=0, limit=limit):
-        if rec.key == 0:
-            zeros.append(total)
-        total += 1
+    for total, key in enumerate(rr.iter_solved_keys(db, start=0, limit=limit), 1):
+        if key == 0:
+            zeros.append(total - 1)
     print(f"db={db} total_read={total} zero_count={len(zeros)} zero_indices={zeros[:50]}")
     return 0
 
@@ -29,25 +29,30 @@ for fmt, label in fmts:
 with open(PATH, "rb") as f:
     buf = f.read(1024)
 
-def safe_unpack(fmt, data, off):
+# Compile each candidate once; records are decoded with the bound unpack_from.
+structs = []
+for fmt, label in fmts:
+    try:
+        structs.append((struct.Struct(fmt), label))
+    except Exception:
+        continue
+
+def safe_unpack(s, data, off):
     try:
-        return struct.Struct(fmt).unpack_from(data, off)
+        return s.unpack_from(data, off)
     except Exception as e:
         return f"ERR: {e}"
 
 print("\nFirst records per format:")
-for fmt, label in fmts:
-    try:
-        sz = struct.calcsize(fmt)
-    except Exception:
-        continue
+for s, label in structs:
+    sz = s.size
     print(f"\n-- {label} --")
     off = 0
     for i in range(K):
         if off + sz > len(buf):
             print("  (not enough bytes in initial buffer)")
             break
-        out = safe_unpack(fmt, buf, off)
+        out = safe_unpack(s, buf, off)
         if isinstance(out, tuple):
             key, turn, win, best, plies = out[:5]
             print(f"  rec[{i}] key={key:016x} turn={turn} win={win} best={best} plies={plies}")
@@ -16,12 +16,17 @@ Usage examples:
 from __future__ import annotations
 
 import argparse
+import bisect
+import functools
 import json
+import mmap
 import os
 import struct
 import sys
+from array import array
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 
 
 # ---------- Utilities ----------
@@ -48,10 +53,39 @@ def decode_move(best: int) -> Optional[Tuple[int, int, int, int]]:
     return rf, cf, rt, ct
 
 
+@contextmanager
+def _mapped(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """
+    Yield a read-only mmap of the whole file so readers can unpack records straight
+    from the page cache instead of copying them into Python bytes first.
+    Zero-length files cannot be mapped; they yield b"" instead.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        # Also flag the file itself as sequentially read, widening page-cache readahead for it.
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Readers scan front to back; let the kernel read ahead aggressively where supported.
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            try:
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            except OSError:
+                pass
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
 # ---------- Binary layout: solved_norm.db ----------
 
-@dataclass
-class SolvedRecord:
+class SolvedRecord(NamedTuple):
     key: int
     turn: int  # 0 X, 1 O
     win: int   # 0/1
@@ -59,57 +93,88 @@ class SolvedRecord:
     plies: int # uint16
 
 
-def _score_solved_format(path: str, fmt: str, rec_size: int, max_samples: int = 512) -> float:
+class SolvedColumns(NamedTuple):
+    """One byte string per field, record i at index i (see solved_columns)."""
+    turn: bytes
+    win: bytes
+    best: bytes
+    plies_lo: bytes  # low byte of the little-endian u16
+    plies_hi: bytes
+
+    def plies(self) -> array:
+        """The u16 plies column as array('H')."""
+        raw = bytearray(2 * len(self.plies_lo))
+        raw[0::2] = self.plies_lo
+        raw[1::2] = self.plies_hi
+        out = array("H")
+        out.frombytes(raw)
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out
+
+
+def _plausible(turn: int, win: int, best: int, plies: int) -> bool:
+    """
+    Field plausibility for one unpacked record (all fields are unsigned):
+      - turn in {0,1}, win in {0,1}
+      - plies on 4x4: 0 <= plies <= 50, and win==1 => plies>=1
+    best needs no check: as a single byte both nibbles are always valid cells (0..15) or 0xFF.
+    """
+    return turn <= 1 and win <= 1 and plies <= 50 and (plies >= 1 or win == 0)
+
+
+# Every plausible (turn, win, plies) triple, so scoring is a set lookup per record (see _plausible).
+_PLAUSIBLE_FIELDS = frozenset(
+    (turn, win, plies)
+    for turn in (0, 1)
+    for win in (0, 1)
+    for plies in range(51)
+    if _plausible(turn, win, 0, plies)
+)
+
+
+def _score_solved_format(path: str, fmt: str, rec_size: int, max_samples: int = 512,
+                         head: Optional[bytes] = None) -> float:
     """
     Heuristic scoring for format detection.
-    Checks the first N records and counts how many have plausible fields:
-      - turn in {0,1}
-      - win in {0,1}
-      - best encodes from/to in [0,15] OR equals 0xFF
-      - plies plausibility on 4x4: 0 <= plies <= 50, and (win==1 => plies>=1)
+    Checks the first N records and counts how many have plausible fields (see _plausible).
     Returns ratio in [0,1].
+    `head` may supply the file's leading bytes (read once by the caller).
     """
     try:
         size = os.path.getsize(path)
         if size < rec_size:
             return 0.0
-        unpack = struct.Struct(fmt).unpack_from
         to_check = min(max_samples, size // rec_size)
         if to_check == 0:
             return 0.0
-        hits = 0
-        with open(path, "rb") as f:
-            data = f.read(min(size, rec_size * to_check))
-        for off in range(0, len(data), rec_size):
-            if off + rec_size > len(data):
-                break
-            try:
-                key, turn, win, best, plies = unpack(data, off)
-            except Exception:
-                continue
-            valid = True
-            if turn not in (0, 1):
-                valid = False
-            if win not in (0, 1):
-                valid = False
-            if best != 0xFF:
-                fidx = (best >> 4) & 0x0F
-                tidx = best & 0x0F
-                if not (0 <= fidx <= 15 and 0 <= tidx <= 15):
-                    valid = False
-            # plies plausibility
-            if not (0 <= plies <= 50):
-                valid = False
-            if win == 1 and plies < 1:
-                valid = False
-            if valid:
-                hits += 1
+        if head is None or len(head) < rec_size * to_check:
+            with _mapped(path) as data:
+                head = data[: rec_size * to_check]
+        # Unpack only (turn, win, plies): the key and best byte become pad bytes, and the
+        # membership count runs in C without a per-record Python branch.
+        score_fmt = "<8xBBx" + fmt[len("<QBBB"):]
+        hits = sum(map(_PLAUSIBLE_FIELDS.__contains__, struct.iter_unpack(score_fmt, head[: rec_size * to_check])))
         return hits / float(to_check)
     except Exception:
         return 0.0
 
 
 def _detect_solved_record_format_from_path(path: str) -> Tuple[str, int]:
+    """
+    Cached front end for _detect_solved_record_format: repeated reads of an unchanged file
+    (same absolute path, mtime and size) reuse the detected layout instead of re-scoring.
+    """
+    st = os.stat(path)
+    return _detect_solved_record_format_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _detect_solved_record_format_cached(path: str, _mtime_ns: int, _size: int) -> Tuple[str, int]:
+    return _detect_solved_record_format(path)
+
+
+def _detect_solved_record_format(path: str) -> Tuple[str, int]:
     """
     Auto-detect struct format by trying plausible layouts and scoring field plausibility.
     We compute the record size from struct.calcsize(fmt) to avoid hard-coded mismatches.
@@ -142,54 +207,99 @@ def _detect_solved_record_format_from_path(path: str) -> Tuple[str, int]:
         if sz > 0 and fsize % sz == 0:
             cand.append((fmt, sz))
     probe = cand if cand else [(fmt, struct.calcsize(fmt)) for fmt in fmts]
+    # Read the sample window once for all candidates. Ties keep the earlier candidate, so a
+    # perfect score ends the search.
+    with _mapped(path) as data:
+        head = bytes(data[: max(rs for _fmt, rs in probe) * 512])
     best_fmt, best_sz, best_score = None, None, -1.0
     for fmt, rs in probe:
-        score = _score_solved_format(path, fmt, rs)
+        score = _score_solved_format(path, fmt, rs, head=head)
         if score > best_score:
             best_fmt, best_sz, best_score = fmt, rs, score
+            if score >= 1.0:
+                break
     if best_fmt is None:
         # Fallback to MSVC-typical 18 bytes
         return "<QBBBxH4x", struct.calcsize("<QBBBxH4x")
     return best_fmt, best_sz
 
 
-def iter_solved_records(path: str, start: int = 0, limit: Optional[int] = None) -> Iterator[SolvedRecord]:
-    fmt, rec_size = _detect_solved_record_format_from_path(path)
+def _iter_unpacked(path: str, fmt: str, rec_size: int, start: int, limit: Optional[int]) -> Iterator[tuple]:
+    """struct.iter_unpack(fmt) over records [start, start+limit) of the mapped file."""
+    with _mapped(path) as data:
+        # Only whole records are read; a trailing partial record is ignored
+        end = len(data) // rec_size
+        if limit is not None:
+            end = min(end, start + limit)
+        start = min(max(start, 0), end)
+        # Decode the whole window with one C-level iter_unpack over a zero-copy view of the
+        # mapping instead of one unpack_from call per record. The views must be released
+        # (and the iterator dropped) before the mapping can close.
+        view = memoryview(data)
+        window = view[start * rec_size:end * rec_size]
+        records = struct.iter_unpack(fmt, window)
+        try:
+            yield from records
+        finally:
+            del records
+            window.release()
+            view.release()
+
+
+def iter_solved_tuples(path: str, start: int = 0, limit: Optional[int] = None) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    Like iter_solved_records, but yields the plain (key, turn, win, best, plies) tuples that
+    struct produces, skipping the per-record SolvedRecord construction.
+    """
+    fmt, _ = _detect_solved_record_format_from_path(path)
     # Ensure rec_size exactly matches the struct format size
-    rec_size = struct.calcsize(fmt)
-    unpack = struct.Struct(fmt).unpack_from
+    return _iter_unpacked(path, fmt, struct.calcsize(fmt), start, limit)
 
-    with open(path, "rb") as f:
-        # Fast skip to start offset
-        if start > 0:
-            f.seek(start * rec_size)
-        remaining = limit if limit is not None else float("inf")
-
-        # Read in reasonable chunks, aligned to record size
-        chunk_bytes = max(64 * 1024, rec_size * 1024)
-        while remaining > 0:
-            to_read = min(chunk_bytes, int(remaining) * rec_size)
-            # Round down to multiple of rec_size to avoid trailing partial record
-            to_read = (to_read // rec_size) * rec_size
-            if to_read <= 0:
-                break
-            data = f.read(to_read)
-            if not data:
-                break
-            for off in range(0, len(data), rec_size):
-                if off + rec_size > len(data):
-                    break
-                key, turn, win, best, plies = unpack(data, off)
-                yield SolvedRecord(
-                    key=key,
-                    turn=turn,
-                    win=win,
-                    best=best,
-                    plies=plies,
-                )
-                remaining -= 1
-                if remaining == 0:
-                    break
+
+def iter_solved_records(path: str, start: int = 0, limit: Optional[int] = None) -> Iterator[SolvedRecord]:
+    return map(SolvedRecord._make, iter_solved_tuples(path, start=start, limit=limit))
+
+
+def solved_columns(path: str, start: int = 0, limit: Optional[int] = None) -> SolvedColumns:
+    """
+    Column view of records [start, start+limit): each field is cut out of the mapping with
+    one strided slice (done in C), so whole-file aggregates can use bytes.count/translate
+    instead of visiting records one by one. Keys are not extracted.
+    """
+    fmt, _ = _detect_solved_record_format_from_path(path)
+    rec_size = struct.calcsize(fmt)
+    # Field offsets: turn, win, best follow the u64 key; plies is the first 'H' after them.
+    plies_off = struct.calcsize(fmt[: fmt.index("H")])
+    with _mapped(path) as data:
+        end = len(data) // rec_size
+        if limit is not None:
+            end = min(end, start + limit)
+        start = min(max(start, 0), end)
+        lo, hi = start * rec_size, end * rec_size
+        return SolvedColumns(
+            turn=data[lo + 8:hi:rec_size],
+            win=data[lo + 9:hi:rec_size],
+            best=data[lo + 10:hi:rec_size],
+            plies_lo=data[lo + plies_off:hi:rec_size],
+            plies_hi=data[lo + plies_off + 1:hi:rec_size],
+        )
+
+
+def count_solved_records(path: str) -> int:
+    """Number of whole records in a solved_norm.db file."""
+    fmt, _ = _detect_solved_record_format_from_path(path)
+    return os.path.getsize(path) // struct.calcsize(fmt)
+
+
+def iter_solved_keys(path: str, start: int = 0, limit: Optional[int] = None) -> Iterator[int]:
+    """
+    Like iter_solved_records, but yields only each record's u64 key (offset 0). The rest of
+    the record is skipped as struct padding, so no other field is decoded.
+    """
+    fmt, _ = _detect_solved_record_format_from_path(path)
+    rec_size = struct.calcsize(fmt)
+    for (key,) in _iter_unpacked(path, f"<Q{rec_size - 8}x", rec_size, start, limit):
+        yield key
 
 
 # ---------- Binary layout: norm_index.db (optional) ----------
@@ -206,6 +316,11 @@ class IndexRecord:
     o: int
     c: int
 
+    @functools.cached_property
+    def card_glyphs(self) -> bytes:
+        """16-byte card layer (A/2/3/4, '.' if none) in cell order, built once per record on first use."""
+        return bytes(_fill_lanes(bytearray(b"." * 16), (self.b4, self.b3, self.b2, self.a), b"432A"))
+
 
 def _detect_index_record_format(file_size: int) -> Tuple[str, int]:
     """
@@ -226,68 +341,133 @@ def _detect_index_record_format(file_size: int) -> Tuple[str, int]:
     return "<QBHHHHHHHB", 24
 
 
-def load_norm_index(path: str) -> Dict[Tuple[int, int], IndexRecord]:
-    recs: Dict[Tuple[int, int], IndexRecord] = {}
+class NormIndex:
+    """
+    Column-oriented norm_index.db: keys, turns and the seven bitboards live in flat arrays
+    sorted by (key, turn), looked up by binary search instead of a dict of per-record objects.
+    Supports the read-only mapping calls the CLI uses: get((key, turn)), `in` and bool();
+    len() counts records in the file (duplicates included).
+    IndexRecord objects are built on first lookup and reused.
+    """
+
+    def __init__(self, keys: array, turns: array, boards: array) -> None:
+        self._keys = keys      # u64, ascending (ties ordered by turn, then file order)
+        self._turns = turns    # u8, parallel to _keys
+        self._boards = boards  # u16 x 7 per record: a, b2, b3, b4, x, o, c
+        self._built: Dict[Tuple[int, int], IndexRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __bool__(self) -> bool:
+        return len(self._keys) > 0
+
+    def __contains__(self, item: object) -> bool:
+        return self.get(item) is not None  # type: ignore[arg-type]
+
+    def get(self, item: Tuple[int, int], default: Optional[IndexRecord] = None) -> Optional[IndexRecord]:
+        rec = self._built.get(item)
+        if rec is not None:
+            return rec
+        key, turn = item
+        keys, turns = self._keys, self._turns
+        # Last row for (key, turn), matching the dict behaviour where later records overwrite earlier ones.
+        pos = bisect.bisect_right(keys, key) - 1
+        while pos >= 0 and keys[pos] == key:
+            if turns[pos] == turn:
+                a, b2, b3, b4, x, o, c = self._boards[pos * 7:pos * 7 + 7]
+                rec = IndexRecord(key, turn, a, b2, b3, b4, x, o, c)
+                self._built[item] = rec
+                return rec
+            pos -= 1
+        return default
+
+
+def load_norm_index(path: str) -> NormIndex:
     size = os.path.getsize(path)
     fmt, rec_size = _detect_index_record_format(size)
-    unpack = struct.Struct(fmt).unpack_from
-    with open(path, "rb") as f:
-        data = f.read()
-    for off in range(0, len(data), rec_size):
-        if off + rec_size > len(data):
-            break
-        fields = unpack(data, off)
-        # fields: key, turn, a, b2, b3, b4, x, o, c, padOrLast
-        key, turn, a, b2, b3, b4, x, o, c, _pad = fields
-        recs[(key, turn)] = IndexRecord(key, turn, a, b2, b3, b4, x, o, c)
-    return recs
+    # The padded layout's format is one byte short of its stride; pad the format to the stride.
+    tail = rec_size - struct.calcsize(fmt)
+    if tail > 0:
+        fmt += f"{tail}x"
+    with _mapped(path) as data:
+        # Whole records only, decoded in bulk from a zero-copy view (see iter_solved_tuples)
+        view = memoryview(data)
+        window = view[: (len(data) // rec_size) * rec_size]
+        keys = array("Q")
+        turns = array("B")
+        boards = array("H")
+        records = struct.iter_unpack(fmt, window)
+        try:
+            # fields: key, turn, a, b2, b3, b4, x, o, c, padOrLast
+            for row in records:
+                keys.append(row[0])
+                turns.append(row[1])
+                boards.extend(row[2:9])
+        finally:
+            del records
+            window.release()
+            view.release()
+    # Stable sort by (key, turn) so equal entries keep file order; skipped if already sorted.
+    n = len(keys)
+    if any((keys[i], turns[i]) > (keys[i + 1], turns[i + 1]) for i in range(n - 1)):
+        order = sorted(range(n), key=lambda i: (keys[i], turns[i]))
+        keys = array("Q", [keys[i] for i in order])
+        turns = array("B", [turns[i] for i in order])
+        boards = array("H", [v for i in order for v in boards[i * 7:i * 7 + 7]])
+    return NormIndex(keys, turns, boards)
 
 
 # ---------- Pretty printing ----------
 
-def _card_char(a: int, b2: int, b3: int, b4: int, idx: int) -> str:
-    bit = 1 << idx
-    if a & bit:
-        return "A"
-    if b2 & bit:
-        return "2"
-    if b3 & bit:
-        return "3"
-    if b4 & bit:
-        return "4"
-    return "."
+def _fill_lanes(glyphs: bytearray, masks: Tuple[int, ...], chars: bytes) -> bytearray:
+    """Write chars[i] into every cell set in masks[i], in order (later lanes win), visiting only set bits."""
+    for mask, ch in zip(masks, chars):
+        mask &= 0xFFFF
+        while mask:
+            low = mask & -mask
+            glyphs[low.bit_length() - 1] = ch
+            mask ^= low
+    return glyphs
 
 
-def render_overlay_grid(a: int, b2: int, b3: int, b4: int, x: int, o: int, c: int) -> str:
+def render_overlay_grid(a: int, b2: int, b3: int, b4: int, x: int, o: int, c: int,
+                        card_glyphs: Optional[bytes] = None) -> str:
     """
-    Overlay precedence: X, O, '#'(collapsed), else card char.
+    Overlay precedence: X, O, '#'(collapsed), else card char (A, 2, 3, 4, '.').
     Returns a multi-line string, 4 rows of 4 space-separated glyphs.
+    card_glyphs (IndexRecord.card_glyphs) supplies a precomputed card layer for a..b4.
     """
-    lines: List[str] = []
-    for r in range(4):
-        row: List[str] = []
-        for cidx in range(4):
-            idx = r * 4 + cidx
-            bit = 1 << idx
-            if x & bit:
-                ch = "X"
-            elif o & bit:
-                ch = "O"
-            elif c & bit:
-                ch = "#"
-            else:
-                ch = _card_char(a, b2, b3, b4, idx)
-            row.append(ch)
-        lines.append(" ".join(row))
-    return "\n".join(lines)
+    if card_glyphs is not None:
+        glyphs = _fill_lanes(bytearray(card_glyphs), (c, o, x), b"#OX")
+    else:
+        glyphs = _fill_lanes(bytearray(b"." * 16), (b4, b3, b2, a, c, o, x), b"432A#OX")
+    text = glyphs.decode("ascii")
+    return "\n".join(" ".join(text[r * 4:r * 4 + 4]) for r in range(4))
 
 
-def list_raw_keys_for(norm2raw_dir: Optional[str], key: int, turn: int) -> Optional[List[str]]:
+def norm2raw_names(norm2raw_dir: str) -> Set[str]:
+    """File names in a norm2raw directory, listed once so per-record lookups skip the stat()."""
+    try:
+        with os.scandir(norm2raw_dir) as it:
+            return {e.name for e in it}
+    except OSError:
+        return set()
+
+
+def list_raw_keys_for(norm2raw_dir: Optional[str], key: int, turn: int,
+                      names: Optional[Set[str]] = None) -> Optional[List[str]]:
+    """
+    Raw torus-shift keys recorded for (key, turn), or None if there are none.
+    `names` may supply the directory listing (see norm2raw_names) in place of an exists() check.
+    """
     if not norm2raw_dir:
         return None
     fname = f"{key:016x}-{turn}.txt"
+    if names is not None and fname not in names:
+        return None
     path = os.path.join(norm2raw_dir, fname)
-    if not os.path.exists(path):
+    if names is None and not os.path.exists(path):
         return None
     out: List[str] = []
     with open(path, "r", encoding="utf-8") as f:
@@ -299,6 +479,24 @@ def list_raw_keys_for(norm2raw_dir: Optional[str], key: int, turn: int) -> Optio
     return out or None
 
 
+@functools.lru_cache(maxsize=1)
+def _best_json_table() -> Tuple[str, ...]:
+    """JSON text of the "best" field for every encoded move byte (0..255), as json.dumps renders it."""
+    table: List[str] = []
+    for best in range(256):
+        mv = decode_move(best)
+        if mv is None:
+            table.append("null")
+            continue
+        rf, cf, rt, ct = mv
+        table.append(json.dumps({
+            "encoded": best,
+            "from": {"idx": (rf * 4 + cf), "r": rf, "c": cf},
+            "to": {"idx": (rt * 4 + ct), "r": rt, "c": ct},
+        }))
+    return tuple(table)
+
+
 # ---------- CLI ----------
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -322,86 +520,87 @@ def main(argv: Optional[List[str]] = None) -> int:
         print(f"error: solved db not found: {args.db}", file=sys.stderr)
         return 2
 
-    idx_map: Dict[Tuple[int, int], IndexRecord] = {}
+    idx_map: Optional[NormIndex] = None
     if args.index:
         if not os.path.exists(args.index):
             print(f"warning: index not found: {args.index} (board overlay will be unavailable)", file=sys.stderr)
         else:
             idx_map = load_norm_index(args.index)
 
+    want_raw = bool(args.norm2raw and args.raw_keys)
+    raw_names = norm2raw_names(args.norm2raw) if want_raw else None
+
     # Streaming read
     if args.format == "json":
-        # JSON array streamed as list with one object per record
-        first = True
-        sys.stdout.write("[")
+        # JSON array streamed as list with one object per record. Each object is assembled from
+        # preformatted pieces (same text json.dumps(obj) would produce) and written in batches.
+        dumps = json.dumps
+        best_json = _best_json_table()
+        out: List[str] = []
+        sep = ""
+        write = sys.stdout.write
+        write("[")
         for rec in iter_solved_records(args.db, start=args.start, limit=args.limit):
-            obj = {
-                "key": f"{rec.key:016x}",
-                "turn": rec.turn,
-                "win": int(rec.win),
-                "plies": int(rec.plies),
-            }
-            mv = decode_move(rec.best)
-            if mv is not None:
-                rf, cf, rt, ct = mv
-                obj["best"] = {
-                    "encoded": rec.best,
-                    "from": {"idx": (rf * 4 + cf), "r": rf, "c": cf},
-                    "to": {"idx": (rt * 4 + ct), "r": rt, "c": ct},
-                }
-            else:
-                obj["best"] = None
+            text = (f'{{"key": "{rec.key:016x}", "turn": {rec.turn}, "win": {rec.win}, '
+                    f'"plies": {rec.plies}, "best": {best_json[rec.best]}')
 
             if idx_map:
                 idx = idx_map.get((rec.key, rec.turn))
                 if idx:
-                    obj["grid"] = {
-                        "a": idx.a, "b2": idx.b2, "b3": idx.b3, "b4": idx.b4,
-                        "x": idx.x, "o": idx.o, "c": idx.c,
-                    }
+                    text += (f', "grid": {{"a": {idx.a}, "b2": {idx.b2}, "b3": {idx.b3}, "b4": {idx.b4}, '
+                             f'"x": {idx.x}, "o": {idx.o}, "c": {idx.c}}}')
 
-            if args.norm2raw and args.raw_keys:
-                raw = list_raw_keys_for(args.norm2raw, rec.key, rec.turn)
+            if want_raw:
+                raw = list_raw_keys_for(args.norm2raw, rec.key, rec.turn, raw_names)
                 if raw:
-                    obj["raw_keys"] = raw
-
-            if not first:
-                sys.stdout.write(",")
-            first = False
-            sys.stdout.write(json.dumps(obj))
+                    text += f', "raw_keys": {dumps(raw)}'
+
+            out.append(text + "}")
+            if len(out) >= 4096:
+                write(sep + ",".join(out))
+                sep = ","
+                out.clear()
+        if out:
+            write(sep + ",".join(out))
         sys.stdout.write("]\n")
         return 0
 
-    # text format
-    count = 0
+    # text format: each record's lines are collected and written in batches rather than
+    # issuing one print() per line.
+    out = []
+    emit = out.append
+    write = sys.stdout.write
+    show_board = bool(args.index and args.board and idx_map)
     for rec in iter_solved_records(args.db, start=args.start, limit=args.limit):
-        print(f"normalized_key: {human_key(rec.key, rec.turn)}")
-        print(f"  win={int(rec.win)} plies={int(rec.plies)}")
+        emit(f"normalized_key: {human_key(rec.key, rec.turn)}\n"
+             f"  win={int(rec.win)} plies={int(rec.plies)}\n")
         mv = decode_move(rec.best)
         if mv is None:
-            print(f"  best: none (0xFF)")
+            emit("  best: none (0xFF)\n")
         else:
             rf, cf, rt, ct = mv
-            print(f"  best: {rec.best} from=({rf},{cf}) to=({rt},{ct})")
+            emit(f"  best: {rec.best} from=({rf},{cf}) to=({rt},{ct})\n")
 
-        if args.index and args.board and idx_map:
+        if show_board:
             idx = idx_map.get((rec.key, rec.turn))
             if idx:
-                print("  Board (normalized, overlay):")
-                grid = render_overlay_grid(idx.a, idx.b2, idx.b3, idx.b4, idx.x, idx.o, idx.c)
-                print("\n".join("    " + line for line in grid.splitlines()))
+                emit("  Board (normalized, overlay):\n")
+                grid = render_overlay_grid(idx.a, idx.b2, idx.b3, idx.b4, idx.x, idx.o, idx.c, idx.card_glyphs)
+                emit("".join("    " + line + "\n" for line in grid.splitlines()))
             else:
-                print("  Board: (missing in index)")
+                emit("  Board: (missing in index)\n")
 
-        if args.norm2raw and args.raw_keys:
-            raw = list_raw_keys_for(args.norm2raw, rec.key, rec.turn)
+        if want_raw:
+            raw = list_raw_keys_for(args.norm2raw, rec.key, rec.turn, raw_names)
             if raw:
-                print("  raw torus keys:")
-                for line in raw:
-                    print(f"    {line}")
-
-        print()
-        count += 1
+                emit("  raw torus keys:\n")
+                emit("".join(f"    {line}\n" for line in raw))
+
+        emit("\n")
+        if len(out) >= 8192:
+            write("".join(out))
+            out.clear()
+    write("".join(out))
     return 0
 
 
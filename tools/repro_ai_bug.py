@@ -8,8 +8,9 @@ Reproduce/diagnose the reported AI defeat on a specific 4x4 board and move histo
 - Replays the provided move sequence, checks legality, and queries the C++ solver at each ply.
 - Prints anomalies when solver claims a win but the scripted line appears to refute it.
 
-Note: This script uses the existing Flask/game glue functions and the C++ CLI if present.
-If the CLI executable is not found, it still validates rules/legality but cannot validate solver outcomes.
+Note: This script uses the existing Flask/game glue functions and the native solver if present
+(libcollapsi in-process, else one long-running `collapsi_cpp --server` child shared by every ply).
+If neither is found, it still validates rules/legality but cannot validate solver outcomes.
 
 Related code paths:
 - C++ solver recursion: [solver.solve_rec()](Collapsi/cpp/src/solver.cpp:27)
@@ -22,7 +23,7 @@ Usage:
 
 from __future__ import annotations
 
-from typing import List, Tuple, Optional, Iterable
+from typing import Dict, List, Tuple, Iterable
 import sys
 import os
 
@@ -35,6 +36,7 @@ try:
         apply_move,
         solve_with_cache,
         solve_moves_cpp,
+        SolveResult,
         _state_to_cpp_arg,
     )
 except ImportError:
@@ -47,11 +49,15 @@ except ImportError:
         apply_move,
         solve_with_cache,
         solve_moves_cpp,
+        SolveResult,
         _state_to_cpp_arg,
     )
 
 Coord = Tuple[int, int]
 
+# Solver results per (encoded state, db_path) for this process; replayed lines revisit positions.
+_SOLVED: Dict[Tuple[str, str], SolveResult] = {}
+
 
 def parse_overlay(rows: List[str], underlying_xo_card: str = "J") -> Tuple[Board, Coord, Coord]:
     """
@@ -61,25 +67,17 @@ def parse_overlay(rows: List[str], underlying_xo_card: str = "J") -> Tuple[Board
       - p2 (O) coordinate
     """
     assert len(rows) == 4 and all(len(r) == 4 for r in rows), "Must provide 4 rows of length 4"
-    grid: List[str] = []
-    p1: Optional[Coord] = None
-    p2: Optional[Coord] = None
-    for r, row in enumerate(rows):
-        for c, ch in enumerate(row):
-            if ch == "X":
-                if p1 is not None:
-                    raise ValueError("Multiple X found")
-                p1 = (r, c)
-                grid.append(underlying_xo_card)
-            elif ch == "O":
-                if p2 is not None:
-                    raise ValueError("Multiple O found")
-                p2 = (r, c)
-                grid.append(underlying_xo_card)
-            else:
-                grid.append(ch)
-    if p1 is None or p2 is None:
+    joined = "".join(rows)
+    if joined.count("X") > 1:
+        raise ValueError("Multiple X found")
+    if joined.count("O") > 1:
+        raise ValueError("Multiple O found")
+    ix, io = joined.find("X"), joined.find("O")
+    if ix < 0 or io < 0:
         raise ValueError("Missing X or O in overlay")
+    p1: Coord = divmod(ix, 4)
+    p2: Coord = divmod(io, 4)
+    grid = joined.translate(str.maketrans({"X": underlying_xo_card, "O": underlying_xo_card}))
     return Board(width=4, height=4, grid=tuple(grid)), p1, p2
 
 
@@ -87,13 +85,22 @@ def pretty_moves(moves: Iterable[Coord]) -> str:
     return "[" + ", ".join(f"({r},{c})" for (r, c) in moves) + "]"
 
 
+def solve_memo(state: GameState, db_path: str) -> SolveResult:
+    """solve_with_cache, memoized per encoded state so repeated positions skip the engine and DB write."""
+    key = (_state_to_cpp_arg(state), db_path)
+    res = _SOLVED.get(key)
+    if res is None:
+        res = _SOLVED[key] = solve_with_cache(state, db_path)
+    return res
+
+
 def check_and_apply(state: GameState, dest: Coord, who: str, db_path: str) -> GameState:
     """
     Prints solver status for current state (if CLI available),
     verifies legality of 'dest', then applies it.
     """
     # Query solver before the move (if CLI exists)
-    res = solve_with_cache(state, db_path)
+    res = solve_memo(state, db_path)
     if res.plies is not None:
         print(f"  Solver says: win={res.win} plies={res.plies} best={res.best_move}")
     else:
@@ -161,12 +168,12 @@ def main() -> int:
     for i, (x_move, o_move) in enumerate(move_pairs, start=1):
         print(f"Move {i}.X to {x_move}")
         state = check_and_apply(state, x_move, who="X", db_path=db_path)
-        print(board.pretty(state.p1, state.p2, set(state.collapsed)))
+        print(board.pretty(state.p1, state.p2, state.collapsed_mask))
         print()
 
         print(f"Move {i}.O to {o_move}")
         state = check_and_apply(state, o_move, who="O", db_path=db_path)
-        print(board.pretty(state.p1, state.p2, set(state.collapsed)))
+        print(board.pretty(state.p1, state.p2, state.collapsed_mask))
         print()
 
     # After last O move, check terminal
@@ -178,7 +185,7 @@ def main() -> int:
         print(f"Terminal: Player {prev} wins (opponent has no legal moves).")
 
     # Also, query solver final stance on the final position (if CLI exists)
-    res_final = solve_with_cache(state, db_path)
+    res_final = solve_memo(state, db_path)
     print(f"Final position solver says: win={res_final.win} plies={res_final.plies} best={res_final.best_move}")
 
     return 0
@@ -2,7 +2,8 @@
 """
 Reproduce and check monotonic plies along a concrete line.
 
-- Uses the native CLI via game.solve_moves_cpp/solve_with_cache.
+- Uses the native solver via game.solve_with_cache_and_moves (libcollapsi in-process,
+  else one persistent `collapsi_cpp --server` child rather than a process per query).
 - Prints, for each step:
   * Root plies (from current state)
   * Per-move "m -> (W/L, plies)"
@@ -17,7 +18,7 @@ Expected monotonicity (for a winning line):
 
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 import os
 import sys
 
@@ -28,8 +29,9 @@ try:
         GameState,
         legal_moves,
         apply_move,
-        solve_with_cache,
-        solve_moves_cpp,
+        solve_with_cache_and_moves,
+        SolveResult,
+        _state_to_cpp_arg,
     )
 except ImportError:
     # Add Collapsi/ to sys.path when running from repo root
@@ -39,12 +41,17 @@ except ImportError:
         GameState,
         legal_moves,
         apply_move,
-        solve_with_cache,
-        solve_moves_cpp,
+        solve_with_cache_and_moves,
+        SolveResult,
+        _state_to_cpp_arg,
     )
 
 Coord = Tuple[int, int]
 
+# Solver answers per encoded (raw, un-normalized) state for the current run_line call:
+# arg -> (SolveResult, per-move map, items).
+_TT: Dict[str, Tuple[SolveResult, Dict[Coord, Dict[str, Any]], List[Dict[str, Any]]]] = {}
+
 def parse_overlay(rows: List[str], underlying_xo_card: str = "J") -> Tuple[Board, Coord, Coord]:
     """
     Parse overlay rows (4 strings of length 4) where 'X' and 'O' mark player pieces.
@@ -73,23 +80,28 @@ def parse_overlay(rows: List[str], underlying_xo_card: str = "J") -> Tuple[Board
         raise ValueError("Missing X or O in overlay")
     return Board(width=4, height=4, grid=tuple(grid)), p1, p2
 
-def per_move_map(state: GameState):
-    items = solve_moves_cpp(state)
+def _move_map(items):
     mp = {}
     for it in items:
         mv = tuple(it["move"])
         mp[mv] = {"win": bool(it["win"]), "plies": it.get("plies")}
-    return mp, items
+    return mp
+
+def solve_step(state: GameState, db_path: str):
+    """Root verdict plus per-move map and items, from one engine answer; memoized in _TT."""
+    k = _state_to_cpp_arg(state)
+    hit = _TT.get(k)
+    if hit is None:
+        root, items = solve_with_cache_and_moves(state, db_path)
+        hit = _TT[k] = (root, _move_map(items), items)
+    return hit
 
 def fmt_moves(items):
-    parts = []
-    for it in items:
-        mv = tuple(it["move"])
-        parts.append(f"{mv}:{'W' if it['win'] else 'L'}:{it.get('plies')}")
-    return "[" + ", ".join(parts) + "]"
+    return "[" + ", ".join(f"{tuple(it['move'])}:{'W' if it['win'] else 'L'}:{it.get('plies')}" for it in items) + "]"
 
 def run_line(rows: List[str], line_moves: List[Tuple[Coord, Optional[Coord]]], title: str) -> None:
     db_path = "collapsi.db"
+    _TT.clear()
     board, p1, p2 = parse_overlay(rows, underlying_xo_card="J")
     state = GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=1)  # X starts
     print(f"=== {title} ===")
@@ -103,12 +115,12 @@ def run_line(rows: List[str], line_moves: List[Tuple[Coord, Optional[Coord]]], t
     for x_move, o_move in line_moves:
         step += 1
         print(f"\nStep {step} (X to move)")
-        root = solve_with_cache(state, db_path)
+        root, mp, items = solve_step(state, db_path)
         print(f"Root says: win={root.win} plies={root.plies} best={root.best_move}")
-        mp, items = per_move_map(state)
         print("Per-move:", fmt_moves(items))
-        if x_move not in legal_moves(state):
-            print(f"X scripted move {x_move} is ILLEGAL here; legal={legal_moves(state)}")
+        legal = legal_moves(state)
+        if x_move not in legal:
+            print(f"X scripted move {x_move} is ILLEGAL here; legal={legal}")
             return
         # Predict after two plies if we have a metric for this move
         sel = mp.get(x_move)
@@ -118,18 +130,19 @@ def run_line(rows: List[str], line_moves: List[Tuple[Coord, Optional[Coord]]], t
             predicted_after_two = None
         state = apply_move(state, x_move)
         print(f"X plays {x_move}")
-        print(state.board.pretty(state.p1, state.p2, set(state.collapsed)))
+        print(state.board.pretty(state.p1, state.p2, state.collapsed_mask))
 
         # Opponent reply scripted?
         if o_move is not None:
-            if o_move not in legal_moves(state):
-                print(f"O scripted move {o_move} is ILLEGAL here; legal={legal_moves(state)}")
+            legal = legal_moves(state)
+            if o_move not in legal:
+                print(f"O scripted move {o_move} is ILLEGAL here; legal={legal}")
                 return
             state = apply_move(state, o_move)
             print(f"O plays {o_move}")
-            print(state.board.pretty(state.p1, state.p2, set(state.collapsed)))
+            print(state.board.pretty(state.p1, state.p2, state.collapsed_mask))
             # Now it's X to move again; check new root plies vs predicted_after_two
-            nxt = solve_with_cache(state, db_path)
+            nxt = solve_step(state, db_path)[0]
             print(f"After two plies, root says: win={nxt.win} plies={nxt.plies} best={nxt.best_move}")
             if predicted_after_two is not None and isinstance(nxt.plies, int):
                 delta = nxt.plies - predicted_after_two
@@ -137,7 +150,7 @@ def run_line(rows: List[str], line_moves: List[Tuple[Coord, Optional[Coord]]], t
                 print(f"Monotonic check: {status}")
         else:
             # No scripted O move; just show O's options and predicted worst reply
-            mp2, items2 = per_move_map(state)
+            _, mp2, items2 = solve_step(state, db_path)
             print("O per-move:", fmt_moves(items2))
 
 def main() -> int:
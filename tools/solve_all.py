@@ -1,62 +1,136 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
+import functools
 import itertools
 import os
+import shutil
+import sqlite3
 import sys
 import time
-from typing import Iterable, List, Sequence, Tuple
+from typing import Iterable, List, Tuple
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from game import Board, GameState, _state_key  # type: ignore
-from game import normalize_for_torus_view, _raw_state_key  # type: ignore
+from game import _mix64, _STATE_KEY_STRUCT  # type: ignore
 
 
 Coord = Tuple[int, int]
 
+# Mapping rows are buffered and written this many at a time, one transaction per batch.
+BATCH_ROWS = 10_000
+
+# Kept apart from collapsi.db, the web app's solved-state cache.
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'mappings.db')
+
+
+_M64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _fold64(h: int, v: int) -> int:
+    """One step of game._hash_state64's fold: Szudzik-pair the running hash with v, mod 2^64."""
+    return (h * h + h + v if h >= v else h + v * v) & _M64
+
+
+def open_mapping_db(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) the norm2raw/raw2norm mapping tables in the SQLite file at `path`."""
+    conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # The raw2norm primary-key index outgrows the default page cache quickly; keep it in memory.
+    conn.execute("PRAGMA cache_size=-262144")  # KiB, i.e. 256 MiB
+    conn.execute("PRAGMA mmap_size=1073741824")
+    conn.execute("CREATE TABLE IF NOT EXISTS norm2raw (norm BLOB NOT NULL, raw BLOB NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS raw2norm (raw BLOB PRIMARY KEY, norm BLOB NOT NULL)")
+    return conn
+
+
+def _flush_mappings(conn: sqlite3.Connection, rows: List[Tuple[bytes, bytes]]) -> None:
+    """Write buffered (norm, raw) pairs to both tables in one transaction and clear the buffer."""
+    if not rows:
+        return
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO norm2raw (norm, raw) VALUES (?, ?)", rows)
+    conn.executemany("INSERT OR REPLACE INTO raw2norm (norm, raw) VALUES (?, ?)", rows)
+    conn.execute("COMMIT")
+    rows.clear()
+
+
+def _flush_mappings_bin(f, rows: List[Tuple[bytes, bytes]]) -> None:
+    """Append buffered (norm, raw) pairs to a flat mapping file and clear the buffer.
+    Each record is 17 bytes: norm u64, raw u64, raw turn u8 (little-endian). The norm key's
+    turn byte is left out because the representative is always turn=1 (0)."""
+    if not rows:
+        return
+    f.write(b"".join(norm[:8] + raw for norm, raw in rows))
+    rows.clear()
+
 
 def idx_to_rc(idx: int, w: int) -> Coord:
     return (idx // w, idx % w)
 
 
-def build_grid_from_positions(j2: int, a_pos: Sequence[int], two_pos: Sequence[int], three_pos: Sequence[int], w: int = 4, h: int = 4) -> Tuple[Tuple[str, ...], Coord, Coord]:
-    total = w * h
-    grid = [''] * total
-    # Place Js
-    grid[0] = 'J'
-    grid[j2] = 'J'
-    # Fill others
-    for i in a_pos:
-        grid[i] = 'A'
-    for i in two_pos:
-        grid[i] = '2'
-    for i in three_pos:
-        grid[i] = '3'
-    # Remaining are '4'
-    for i in range(total):
-        if grid[i] == '':
-            grid[i] = '4'
-    return tuple(grid), idx_to_rc(0, w), idx_to_rc(j2, w)
+def _grids_for_j2(j2: int) -> Iterable[Tuple[str, ...]]:
+    """Card grids with the second J at index `j2` (A, 2 and 3 cells in combination order, '4'
+    elsewhere). Each (a_pos, two_pos) prefix is filled once into an all-'4' template; the
+    innermost level only copies it and overwrites the four '3' cells."""
+    rem1 = [i for i in range(16) if i not in (0, j2)]
+    for a_pos in itertools.combinations(rem1, 4):
+        rem2 = [i for i in rem1 if i not in a_pos]
+        for two_pos in itertools.combinations(rem2, 4):
+            rem3 = [i for i in rem2 if i not in two_pos]
+            base = ['4'] * 16
+            base[0] = base[j2] = 'J'
+            for i in a_pos:
+                base[i] = 'A'
+            for i in two_pos:
+                base[i] = '2'
+            for t0, t1, t2, t3 in itertools.combinations(rem3, 4):
+                grid = base.copy()
+                grid[t0] = grid[t1] = grid[t2] = grid[t3] = '3'
+                yield tuple(grid)
+
+
+def _raw_key_pairs_for_j2(j2: int) -> Iterable[Tuple[bytes, bytes]]:
+    """Binary _raw_state_key (u64 hash + u8 turn, as _state_key_blob packs it) of every grid
+    of _grids_for_j2 (same order), with X to move and with O to move.
+
+    Grids are walked as (a, b2, b3, b4) card bitboards (J counts as A, as in game._card_masks)
+    with X on the J at index 0, O on the J at j2 and nothing collapsed. game._hash_state64
+    folds the bitboards left to right, so the fold over a is done once per A placement, over
+    b2 once per 2 placement, and only the tail (b3, b4, x, o, c, turn) per grid."""
+    pack = _STATE_KEY_STRUCT.pack
+    x, o = 1, 1 << j2
+    # Squares are handled as single-bit masks, so placing cards is OR-ing and the free
+    # squares left for the next card are the bits not yet taken.
+    rem1 = [1 << i for i in range(1, 16) if i != j2]
+    for a0, a1, a2, a3 in itertools.combinations(rem1, 4):
+        a = 1 | o | a0 | a1 | a2 | a3
+        h_a = _fold64(0, a)
+        rem2 = [bit for bit in rem1 if not bit & a]
+        for t0, t1, t2, t3 in itertools.combinations(rem2, 4):
+            b2 = t0 | t1 | t2 | t3
+            h_b2 = _fold64(h_a, b2)
+            rest = 0xFFFF ^ a ^ b2
+            rem3 = [bit for bit in rem2 if bit & rest]
+            for t0, t1, t2, t3 in itertools.combinations(rem3, 4):
+                b3 = t0 | t1 | t2 | t3
+                h = _fold64(_fold64(_fold64(_fold64(_fold64(h_b2, b3), rest ^ b3), x), o), 0)
+                yield (pack(_mix64(_fold64(h, 0)), 0), pack(_mix64(_fold64(h, 1)), 1))
 
 
 def enumerate_canonical_grids() -> Iterable[Tuple[Tuple[str, ...], Coord, Coord]]:
     """Enumerate 4x4 grids with composition 2xJ, 4xA, 4x2, 4x3, 2x4, fixing one J at index 0.
     This removes 16× torus translations on average by fixing X at (0,0)."""
-    all_idx = list(range(16))
     for j2 in range(1, 16):
-        rem1 = [i for i in all_idx if i not in (0, j2)]
-        for a_pos in itertools.combinations(rem1, 4):
-            rem2 = [i for i in rem1 if i not in a_pos]
-            for two_pos in itertools.combinations(rem2, 4):
-                rem3 = [i for i in rem2 if i not in two_pos]
-                for three_pos in itertools.combinations(rem3, 4):
-                    yield build_grid_from_positions(j2, a_pos, two_pos, three_pos)
-
-
-def process(args: argparse.Namespace) -> None:
-    w = 4
-    h = 4
+        p1, p2 = idx_to_rc(0, 4), idx_to_rc(j2, 4)
+        for grid in _grids_for_j2(j2):
+            yield grid, p1, p2
+
+
+def process(args: argparse.Namespace) -> int:
     db = args.db
     stride = max(1, int(args.stride))
     offset = max(0, int(args.offset))
@@ -69,66 +143,101 @@ def process(args: argparse.Namespace) -> None:
     j2_values = list(range(1, 16))
     j2_values = [j2 for i, j2 in enumerate(j2_values) if (i % stride) == offset]
 
+    if args.format == 'bin':
+        sink = open(db, 'ab')
+        flush = functools.partial(_flush_mappings_bin, sink)
+    else:
+        sink = open_mapping_db(db)
+        flush = functools.partial(_flush_mappings, sink)
+    pending: List[Tuple[bytes, bytes]] = []
+
     for j2 in j2_values:
-        rem1 = [i for i in range(16) if i not in (0, j2)]
-        for a_pos in itertools.combinations(rem1, 4):
-            rem2 = [i for i in rem1 if i not in a_pos]
-            for two_pos in itertools.combinations(rem2, 4):
-                rem3 = [i for i in rem2 if i not in two_pos]
-                for three_pos in itertools.combinations(rem3, 4):
-                    grid, p1, p2 = build_grid_from_positions(j2, a_pos, two_pos, three_pos, w, h)
-                    board = Board(width=w, height=h, grid=grid)
-                    # Build raw (unnormalized) states for both turns
-                    raw_states = [
-                        GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=1),
-                        GameState(board=board, collapsed=tuple(), p1=p1, p2=p2, turn=2),
-                    ]
-                    # Compute normalized key for mapping (use turn=1 canonical as representative)
-                    norm_board, np1, np2, ncol, dr, dc = normalize_for_torus_view(raw_states[0])
-                    norm_state = GameState(board=norm_board, collapsed=ncol, p1=np1, p2=np2, turn=1)
-                    norm_key = _state_key(norm_state)
-                    # Only generate mapping files now (no solving)
-                    # Prepare output dirs under project data/
-                    base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
-                    norm_dir = os.path.join(base, 'norm2raw')
-                    raw_dir = os.path.join(base, 'raw2norm')
-                    os.makedirs(norm_dir, exist_ok=True)
-                    os.makedirs(raw_dir, exist_ok=True)
-                    # Sanitize filenames (Windows: '|' is invalid)
-                    norm_fname = norm_key.replace('|', '-') + '.txt'
-                    norm_path = os.path.join(norm_dir, norm_fname)
-                    for rs in raw_states:
-                        raw_key = _raw_state_key(rs)
-                        raw_fname = raw_key.replace('|', '-') + '.txt'
-                        raw_path = os.path.join(raw_dir, raw_fname)
-                        # Append to norm2raw list
-                        with open(norm_path, 'a', encoding='utf-8') as f:
-                            f.write(raw_key + '\n')
-                        # Write/overwrite raw2norm mapping (single line)
-                        with open(raw_path, 'w', encoding='utf-8') as f:
-                            f.write(norm_key)
-                    processed += 1
-                    if max_count is not None and processed >= max_count:
-                        break
-                if max_count is not None and processed >= max_count:
-                    break
+        for raw1, raw2 in _raw_key_pairs_for_j2(j2):
+            # Normalization shifts X to (0,0), where it already is, so the normalized
+            # (turn=1 representative) key is the raw turn=1 key.
+            norm_key = raw1
+            # Only record the norm<->raw mapping now (no solving)
+            pending.append((norm_key, raw1))
+            pending.append((norm_key, raw2))
+            if len(pending) >= BATCH_ROWS:
+                flush(pending)
+            processed += 1
             if max_count is not None and processed >= max_count:
                 break
         if max_count is not None and processed >= max_count:
             break
+    flush(pending)
+    sink.close()
 
     elapsed = time.time() - start_time
     print(f"Processed={processed} solved={solved} skipped={skipped} elapsed_sec={elapsed:.1f}")
+    return processed
+
+
+def merge_mapping_shard(conn: sqlite3.Connection, shard_path: str) -> None:
+    """Append a shard's mapping tables into `conn`'s database in one transaction, then delete the shard files."""
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO norm2raw (norm, raw) SELECT norm, raw FROM shard.norm2raw ORDER BY rowid")
+        conn.execute("INSERT OR REPLACE INTO raw2norm (raw, norm) SELECT raw, norm FROM shard.raw2norm")
+        conn.execute("COMMIT")
+    finally:
+        conn.execute("DETACH DATABASE shard")
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(shard_path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def process_parallel(args: argparse.Namespace) -> None:
+    """Run `args.jobs` sub-shards of the (stride, offset) shard in worker processes.
+    Sub-shard k takes stride*jobs / offset+k*stride, so together they cover the same j2 values;
+    --limit applies to each job. Each job writes its own `<db>.shard<k>` file, so workers never
+    contend for the SQLite write lock; the shards are merged into --db once all jobs finish
+    (flat files are simply concatenated in shard order)."""
+    jobs = int(args.jobs)
+    stride = max(1, int(args.stride))
+    offset = max(0, int(args.offset))
+    shards = [
+        argparse.Namespace(**{**vars(args), 'stride': stride * jobs, 'offset': offset + k * stride, 'jobs': 1,
+                              'db': f"{args.db}.shard{k}"})
+        for k in range(jobs)
+    ]
+    start_time = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        total = sum(pool.map(process, shards))
+    if args.format == 'bin':
+        with open(args.db, 'ab') as out:
+            for shard in shards:
+                with open(shard.db, 'rb') as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+                os.remove(shard.db)
+    else:
+        conn = open_mapping_db(args.db)
+        for shard in shards:
+            merge_mapping_shard(conn, shard.db)
+        conn.close()
+    print(f"Jobs={jobs} processed={total} elapsed_sec={time.time() - start_time:.1f}")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Exhaustively solve 4x4 Collapsi boards (canonicalized by torus shift)")
-    parser.add_argument('--db', default='collapsi.db', help='SQLite DB file path')
+    parser.add_argument('--db', default=DEFAULT_DB, help='Output file: SQLite DB with norm2raw/raw2norm tables, or the flat file with --format bin (default data/mappings.db)')
+    parser.add_argument('--format', choices=('sqlite', 'bin'), default='sqlite',
+                        help='sqlite (default) or bin: append-only 17-byte (norm u64, raw u64, turn u8) records')
     parser.add_argument('--stride', type=int, default=1, help='Shard stride for parallel runs (default 1)')
     parser.add_argument('--offset', type=int, default=0, help='Shard offset [0..stride-1] for parallel runs')
     parser.add_argument('--limit', type=int, default=None, help='Limit number of processed grids (for testing)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes splitting this shard (default 1; 0 = one per CPU)')
     args = parser.parse_args()
-    process(args)
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    if args.jobs > 1:
+        process_parallel(args)
+    else:
+        process(args)
 
 
 if __name__ == '__main__':
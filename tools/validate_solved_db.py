@@ -14,13 +14,15 @@ Validate solved_norm.db for plausibility and summarize statistics.
 Usage:
   python Collapsi/tools/validate_solved_db.py Collapsi/data/solved_norm.db         # all records
   python Collapsi/tools/validate_solved_db.py Collapsi/data/solved_norm.db 500000  # first 500k
+  python Collapsi/tools/validate_solved_db.py Collapsi/data/solved_norm.db all 8   # all, 8 worker processes (0 = one per CPU)
 """
 from __future__ import annotations
 
+import concurrent.futures
 import json
 import os
 import sys
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 
 # Ensure we can import the local reader
 HERE = os.path.dirname(__file__)
@@ -30,102 +32,117 @@ if HERE not in sys.path:
 import read_records as rr
 
 
-def validate(db_path: str, limit: Optional[int] = None) -> None:
+def _best_ok(b: int) -> bool:
+    """Move encoding validity: 0xFF (none) or from/to nibbles within [0,15]."""
+    if b == 0xFF:
+        return True
+    f = (b >> 4) & 0x0F
+    t = b & 0x0F
+    return 0 <= f <= 15 and 0 <= t <= 15
+
+
+# bytes.translate tables turning a column into per-record 0/1 flags.
+_BAD_BEST = bytes(0 if _best_ok(b) else 1 for b in range(256))
+_IS_ZERO = bytes(1 if v == 0 else 0 for v in range(256))
+_IS_ONE = bytes(1 if v == 1 else 0 for v in range(256))
+_OVER_50 = bytes(1 if v > 50 else 0 for v in range(256))
+_NONZERO = bytes(0 if v == 0 else 1 for v in range(256))
+
+
+# Below this many records a scan is faster in-process than spreading it over workers.
+_PARALLEL_MIN_RECORDS = 1 << 23
+
+
+def _first_flags(flags: bytes, count: int = 10) -> List[int]:
+    """Indices of the first `count` records flagged 1."""
+    out: List[int] = []
+    pos = flags.find(1)
+    while pos >= 0 and len(out) < count:
+        out.append(pos)
+        pos = flags.find(1, pos + 1)
+    return out
+
+
+def _summarize_range(db_path: str, start: int, limit: int) -> Dict[str, Any]:
     """
-    Stream-validate the DB. If limit is None or <=0, process all entries.
+    Counters for records [start, start+limit), with sample indices made absolute.
+    Whole-column pass: every check runs as bytes.count/translate over one field column,
+    and per-record flags are combined as big integers (one 0/1 byte per record).
     """
-    # Helper for move encoding validity
-    def _best_ok(b: int) -> bool:
-        if b == 0xFF:
-            return True
-        f = (b >> 4) & 0x0F
-        t = b & 0x0F
-        return 0 <= f <= 15 and 0 <= t <= 15
-
-    # Aggregates
-    n = 0
-    turn0 = 0
-    turn1 = 0
-    win0 = 0
-    win1 = 0
-    plies_min: Optional[int] = None
-    plies_max: Optional[int] = None
-    plies_sum: int = 0
-    bad_move_count = 0
-    anomaly_count = 0
-    bad_move_sample: List[int] = []
-    anomaly_sample: List[int] = []
-    first5: List[dict] = []
+    cols = rr.solved_columns(db_path, start=start, limit=limit)
+    n = len(cols.turn)
+    plies = cols.plies()
+
+    def as_int(flags: bytes) -> int:
+        return int.from_bytes(flags, "big")
+
+    bad_move_flags = cols.best.translate(_BAD_BEST)
+    # plies > 50, or win == 1 with plies == 0 (fields are unsigned, so no other lower bound applies)
+    anomalies = (
+        as_int(cols.plies_lo.translate(_OVER_50))
+        | as_int(cols.plies_hi.translate(_NONZERO))
+        | (as_int(cols.win.translate(_IS_ONE))
+           & as_int(cols.plies_lo.translate(_IS_ZERO))
+           & as_int(cols.plies_hi.translate(_IS_ZERO)))
+    )
+    anomaly_flags = anomalies.to_bytes(n, "big")
+    return {
+        "count": n,
+        "turn0": cols.turn.count(0),
+        "turn1": cols.turn.count(1),
+        "win0": cols.win.count(0),
+        "win1": cols.win.count(1),
+        "plies_min": (min(plies) if n > 0 else None),
+        "plies_max": (max(plies) if n > 0 else None),
+        "plies_sum": sum(plies),
+        "bad_move_count": bad_move_flags.count(1),
+        "bad_move_sample": [start + i for i in _first_flags(bad_move_flags)],
+        "anomaly_count": anomaly_flags.count(1),
+        "anomaly_sample": [start + i for i in _first_flags(anomaly_flags)],
+    }
+
 
+def validate(db_path: str, limit: Optional[int] = None, jobs: int = 1) -> None:
+    """
+    Stream-validate the DB. If limit is None or <=0, process all entries.
+    With jobs > 1, large scans are split into `jobs` contiguous ranges summarized in worker
+    processes and then reduced.
+    """
     effective_limit = limit if (limit is not None and limit > 0) else (1 << 62)
+    total = min(rr.count_solved_records(db_path), effective_limit)
+
+    if jobs > 1 and total >= _PARALLEL_MIN_RECORDS:
+        step = -(-total // jobs)
+        starts = list(range(0, total, step))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(starts)) as pool:
+            parts = list(pool.map(_summarize_range, [db_path] * len(starts), starts,
+                                  [min(step, total - s) for s in starts]))
+    else:
+        parts = [_summarize_range(db_path, 0, total)]
+
+    n = sum(p["count"] for p in parts)
+    filled = [p for p in parts if p["count"]]
+
+    first5: List[dict] = [
+        {"key": f"{key:016x}|{t}", "turn": t, "win": w, "best": b, "plies": p}
+        for key, t, w, b, p in rr.iter_solved_tuples(db_path, start=0, limit=min(5, effective_limit))
+    ]
 
-    idx = 0
-    for r in rr.iter_solved_records(db_path, start=0, limit=effective_limit):
-        t = int(r.turn)
-        w = int(r.win)
-        p = int(r.plies)
-        b = int(r.best)
-
-        if idx < 5:
-            first5.append({
-                "key": f"{r.key:016x}|{r.turn}",
-                "turn": t,
-                "win": w,
-                "best": b,
-                "plies": p,
-            })
-
-        n += 1
-        if t == 0:
-            turn0 += 1
-        elif t == 1:
-            turn1 += 1
-
-        if w == 1:
-            win1 += 1
-        elif w == 0:
-            win0 += 1
-
-        if not _best_ok(b):
-            bad_move_count += 1
-            if len(bad_move_sample) < 10:
-                bad_move_sample.append(idx)
-
-        anom = False
-        if not (0 <= p <= 50):
-            anom = True
-        elif w == 1 and p < 1:
-            anom = True
-        elif w == 0 and p < 0:
-            anom = True
-        if anom:
-            anomaly_count += 1
-            if len(anomaly_sample) < 10:
-                anomaly_sample.append(idx)
-
-        if plies_min is None or p < plies_min:
-            plies_min = p
-        if plies_max is None or p > plies_max:
-            plies_max = p
-        plies_sum += p
-
-        idx += 1
-
-    avg_plies = (round(plies_sum / n, 2) if n > 0 else None)
+    avg_plies = (round(sum(p["plies_sum"] for p in parts) / n, 2) if n > 0 else None)
 
     summary = {
         "count": n,
-        "turns": {"0": turn0, "1": turn1},
-        "wins": {"0": win0, "1": win1},
+        "turns": {"0": sum(p["turn0"] for p in parts), "1": sum(p["turn1"] for p in parts)},
+        "wins": {"0": sum(p["win0"] for p in parts), "1": sum(p["win1"] for p in parts)},
         "plies": {
-            "min": (plies_min if n > 0 else None),
+            "min": (min(p["plies_min"] for p in filled) if n > 0 else None),
             "avg": avg_plies,
-            "max": (plies_max if n > 0 else None),
+            "max": (max(p["plies_max"] for p in filled) if n > 0 else None),
         },
-        "bad_move_count": bad_move_count,
-        "bad_move_sample": bad_move_sample,
-        "anomaly_count": anomaly_count,
-        "anomaly_sample": anomaly_sample,
+        "bad_move_count": sum(p["bad_move_count"] for p in parts),
+        "bad_move_sample": [i for p in parts for i in p["bad_move_sample"]][:10],
+        "anomaly_count": sum(p["anomaly_count"] for p in parts),
+        "anomaly_sample": [i for p in parts for i in p["anomaly_sample"]][:10],
         "first5": first5,
     }
     print(json.dumps(summary, indent=2))
@@ -142,4 +159,11 @@ if __name__ == "__main__":
                 lim = int(lim_arg)
             except Exception:
                 lim = None
-    validate(db, lim)
\ No newline at end of file
+    jobs_arg = sys.argv[3] if len(sys.argv) > 3 else "1"
+    try:
+        jobs = int(jobs_arg)
+    except ValueError:
+        jobs = 1
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    validate(db, lim, jobs)